@@ -0,0 +1,21 @@
+"""app URL Configuration of the ASGI deployment
+
+Serves the hot user endpoints with their async views and everything else
+with the `app.urls` patterns, except the streaming endpoints: Django 3.2
+iterates a streaming response synchronously on the event loop, so the user
+import and export are WSGI-only and answer 404 here. The export changes
+are not streamed and are still served.
+"""
+from app.urls import urlpatterns as wsgi_urlpatterns
+
+from django.urls import path
+
+from users import views
+
+urlpatterns = [
+    path('api/auth', views.login, name='auth-list'),
+    path('api/me', views.profile, name='user_me-detail'),
+    path('api/users/create', views.create_user, name='user_create-list'),
+    path('api/users/import', views.wsgi_only),
+    path('api/users/export', views.wsgi_only),
+] + wsgi_urlpatterns
@@ -42,18 +42,20 @@ LOCAL_APPS = [
 INSTALLED_APPS += THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    'utils.middlewares.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'utils.middlewares.AuthenticationMiddlewareJWT',
+    'utils.middlewares.ReplicaRoutingMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'app.urls'
+ROOT_URLCONF = os.environ.get('ROOT_URLCONF', 'app.urls')
 
 TEMPLATES = [
     {
@@ -73,17 +75,86 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'app.wsgi.application'
 
+# Threads running the database work of async views.
+ASYNC_DB_THREADS = int(os.environ.get('ASYNC_DB_THREADS', '8'))
+
+# Set DB_POOL to share a pool of connections between the threads of each
+# process instead of connecting on every request, see
+# utils.db.backends.postgresql_pool.
+DB_POOL = str(os.environ.get('DB_POOL', 'False')).lower() == 'true'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'ENGINE': (
+            'utils.db.backends.postgresql_pool' if DB_POOL
+            else 'django.db.backends.postgresql_psycopg2'
+        ),
         'NAME': os.environ.get('POSTGRES_DB', 'moderna'),
         'USER': os.environ.get('POSTGRES_USER', 'postgres'),
         'PASSWORD': os.environ.get('POSTGRES_PASSWORD', 'postgres'),
         'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
         'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+        'POOL': {
+            'MIN_SIZE': int(os.environ.get('DB_POOL_MIN_SIZE', '1')),
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+            # Seconds to wait for a free connection.
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', '10')),
+            # Seconds idle after which a connection is checked on checkout.
+            'CHECK_IDLE': float(os.environ.get('DB_POOL_CHECK_IDLE', '5')),
+            # Seconds idle after which connections above MIN_SIZE close.
+            'MAX_IDLE': float(os.environ.get('DB_POOL_MAX_IDLE', '300')),
+        },
     }
 }
 
+# Read replicas of the primary, as comma separated host[:port]. Reads made
+# while serving requests go to the healthy replicas, see
+# utils.db.routers.ReplicaRouter.
+DATABASE_REPLICAS = []
+for index, replica in enumerate(
+        filter(None, os.environ.get('POSTGRES_REPLICA_HOSTS', '').split(','))):
+    host, _, port = replica.strip().partition(':')
+    alias = 'replica_{0}'.format(index)
+    DATABASES[alias] = dict(
+        DATABASES['default'],
+        HOST=host,
+        PORT=port or DATABASES['default']['PORT'],
+        TEST={'MIRROR': 'default'}
+    )
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['utils.db.routers.ReplicaRouter']
+
+# Seconds the reads of a user stay on the primary after they wrote.
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', '5'))
+# Cache remembering who wrote recently. With replicas and several server
+# processes, it must be shared by all of them, e.g. memcached.
+REPLICA_STICKY_CACHE = 'default'
+# Seconds between health checks of each replica.
+REPLICA_HEALTH_INTERVAL = int(
+    os.environ.get('REPLICA_HEALTH_INTERVAL', '10')
+)
+
+# Caches shared by the server processes once CACHE_BACKEND names a shared
+# backend, e.g. memcached. The default one is local to each process.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# Seconds a change waits before the delta sync returns it, longer than
+# the transactions and the replication lag, see utils.mixins.ChangesMixin.
+CHANGES_SETTLE_SECONDS = int(os.environ.get('CHANGES_SETTLE_SECONDS', '5'))
+# Days the tombstones of the deleted rows are kept, see the prune_tombstones
+# command. Clients that last synced before have to sync from the start.
+TOMBSTONE_RETENTION_DAYS = int(
+    os.environ.get('TOMBSTONE_RETENTION_DAYS', '30')
+)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
@@ -92,6 +163,29 @@ AUTH_PASSWORD_VALIDATORS = [
 
 AUTH_USER_MODEL = 'users.User'
 
+# Process pool verifying login passwords, 0 verifies in the request worker.
+PASSWORD_VERIFIER_WORKERS = int(
+    os.environ.get('PASSWORD_VERIFIER_WORKERS', '0')
+)
+PASSWORD_VERIFIER_QUEUE_SIZE = int(
+    os.environ.get('PASSWORD_VERIFIER_QUEUE_SIZE', '64')
+)
+PASSWORD_VERIFIER_TIMEOUT = float(
+    os.environ.get('PASSWORD_VERIFIER_TIMEOUT', '5')
+)
+
+AUTHENTICATION_BACKENDS = [
+    'users.backends.PermissionBackend',
+]
+
+# Per process cache of the compiled permission masks of each user.
+PERMISSION_CACHE_SIZE = int(os.environ.get('PERMISSION_CACHE_SIZE', '4096'))
+PERMISSION_CACHE_TTL = int(os.environ.get('PERMISSION_CACHE_TTL', '300'))
+
+# Seconds a permission version is trusted before it is checked against the
+# database again.
+PERMISSION_VERSION_TTL = int(os.environ.get('PERMISSION_VERSION_TTL', '60'))
+
 LANGUAGE_CODE = 'en-us'
 
 TIME_ZONE = 'UTC'
@@ -115,10 +209,44 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'utils.authentication.JSONWebTokenAuthentication',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'utils.pagination.KeysetPagination',
+    'PAGE_SIZE': int(os.environ.get('PAGE_SIZE', '50')),
+    # Bursts and rates of the token buckets of utils.throttling, by the
+    # throttle_scope of the view and what they count by.
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.environ.get('THROTTLE_LOGIN_IP', '30/m'),
+        'login_email': os.environ.get('THROTTLE_LOGIN_EMAIL', '10/m'),
+        'signup_ip': os.environ.get('THROTTLE_SIGNUP_IP', '20/h'),
+        'signup_email': os.environ.get('THROTTLE_SIGNUP_EMAIL', '5/h'),
+    },
 }
 
+# File shared by the worker processes holding the throttle buckets, every
+# process keeps its own buckets without it.
+THROTTLE_STORE = os.environ.get('THROTTLE_STORE') or None
+THROTTLE_BUCKETS = int(os.environ.get('THROTTLE_BUCKETS', '65536'))
+
 JWT_AUTH_HEADER_PREFIX = 'Bearer'
 
+# Per route request metrics. With a directory, every worker process writes
+# its metrics to a file there and the endpoint sums them.
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+METRICS_MAX_ROUTES = int(os.environ.get('METRICS_MAX_ROUTES', '256'))
+
+# Per process cache of verified tokens and the user they belong to.
+JWT_USER_CACHE_SIZE = int(os.environ.get('JWT_USER_CACHE_SIZE', '1024'))
+JWT_USER_CACHE_TTL = int(os.environ.get('JWT_USER_CACHE_TTL', '60'))
+
+# Sign the user claims and a permission version into new tokens, so that
+# requests carrying a current token are authenticated without the database.
+JWT_EMBED_CLAIMS = str(
+    os.environ.get('JWT_EMBED_CLAIMS', 'False')
+).lower() == 'true'
+
+# Cache of the serialized /api/me payloads, see users.profile.ProfileCache.
+PROFILE_CACHE = 'default'
+PROFILE_CACHE_TTL = int(os.environ.get('PROFILE_CACHE_TTL', '300'))
+
 ALLOWED_HOSTS = [
     'localhost',
     '127.0.0.1'
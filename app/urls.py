@@ -14,30 +14,33 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from importlib import import_module
+from importlib.util import find_spec
 
 from app.settings import LOCAL_APPS
 
 from django.contrib import admin
-from django.urls import include, path, re_path
+from django.urls import path
+from django.urls.resolvers import RegexPattern
 
+from utils.dispatch import TrieURLResolver
 from utils.routers import DefaultRouter
 
 router = DefaultRouter(trailing_slash=False)
 
 
 def autodiscover():
-    "Search for api.py files in the local apps"
+    "Import the routes.py (or else api.py) module of the local apps"
     for app in LOCAL_APPS:
-        try:
-            import_module('.'.join((app, 'api')))
-        except ImportError as e:
-            if e.msg != "No module named '{0}.api'".format(app):
-                print(e.msg)
+        for name in ('routes', 'api'):
+            module = '.'.join((app, name))
+            if find_spec(module) is not None:
+                import_module(module)
+                break
 
 
 autodiscover()
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    re_path(r'^api/', include(router.urls))
+    TrieURLResolver(RegexPattern(r'^api/'), router)
 ]
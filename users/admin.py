@@ -4,6 +4,12 @@ from django.contrib.auth.admin import UserAdmin
 
 from users.models import User
 
+from utils.pagination import EstimatedCountPaginator
+
+# Shorter search terms match emails by prefix, as trigram indexes need
+# three characters.
+TRIGRAM_LENGTH = 3
+
 
 class CustomUserAdmin(UserAdmin):
     """Admin for user"""
@@ -13,6 +19,9 @@ class CustomUserAdmin(UserAdmin):
 
     list_filter = ['is_staff', 'is_superuser', 'is_active', 'groups']
     search_fields = ['email']
+    # The table is counted by the planner estimate, and only once.
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     filter_horizontal = ['groups', 'user_permissions']
     fieldsets = (
         ('Personal info', {'fields': (
@@ -38,5 +47,14 @@ class CustomUserAdmin(UserAdmin):
         }),
     )
 
+    def get_search_results(self, request, queryset, search_term):
+        """Search by prefix the terms too short for the trigram index."""
+        term = search_term.strip()
+        if term and len(term) < TRIGRAM_LENGTH:
+            return queryset.filter(email__istartswith=term), False
+        return super(CustomUserAdmin, self).get_search_results(
+            request, queryset, search_term
+        )
+
 
 admin.site.register(User, CustomUserAdmin)
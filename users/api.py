@@ -1,17 +1,24 @@
 """User API."""
-from app.urls import router
+import codecs
+import json
 
 from django.contrib.auth import get_user_model
-from django.shortcuts import get_object_or_404
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
 
-from rest_framework import mixins, status, viewsets
-from rest_framework.permissions import AllowAny
+from rest_framework import exceptions, mixins, status, viewsets
+from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.response import Response
 
 from users import serializers
+from users.exporters import EXPORTERS, iter_users
+from users.importers import ImportUserSerializer, import_users, read_rows
+from users.profile import get_profile, is_fresh
 
-from utils.mixins import BaseGenericViewSet
-from utils.routers import SingleObjectRouter
+from utils.mixins import BaseGenericViewSet, ChangesMixin
+from utils.renderers import CSVRenderer, JSONLinesRenderer
+from utils.serializers import compile_serializer
+from utils.throttling import EmailThrottle, IPThrottle
 
 # User model
 User = get_user_model()
@@ -25,10 +32,26 @@ class ProfileViewSet(mixins.RetrieveModelMixin,
     serializer_class = serializers.UserProfileSerializer
     retrieve_serializer_class = serializers.UserProfileSerializer
 
+    # Most queries each action may run, see utils.testing.
+    query_budgets = {'retrieve': 4}
+
     def get_object(self):
         """Return the user in session."""
         return self.request.user
 
+    def retrieve(self, request, *args, **kwargs):
+        """Return the cached profile, or 304 if the client already has it."""
+        etag, data = get_profile(self.get_object())
+
+        if is_fresh(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data)
+
+        response['ETag'] = etag
+        patch_vary_headers(response, ['Authorization'])
+        return response
+
 
 class AuthViewSet(mixins.CreateModelMixin,
                   viewsets.GenericViewSet,
@@ -42,11 +65,14 @@ class AuthViewSet(mixins.CreateModelMixin,
     queryset = User.objects.all()
 
     permission_classes = [AllowAny]
+    # Checked before the user is read and the password hashed.
+    throttle_classes = [IPThrottle, EmailThrottle]
+    throttle_scope = 'login'
 
-    def get_object(self, email):
-        """Return the user with given email"""
-        queryset = self.get_queryset()
-        return get_object_or_404(queryset, email=email)
+    # The user, then the permission masks whose version is signed into the
+    # token with JWT_EMBED_CLAIMS. Rehashing the password when the hasher
+    # changes adds its update.
+    query_budgets = {'create': 2}
 
     def create(self, request, *args, **kwargs):
         """User login with local credentials"""
@@ -58,13 +84,13 @@ class AuthViewSet(mixins.CreateModelMixin,
         validation_response = login_serializer.is_valid(raise_exception=True)
 
         if validation_response:
-            user = self.get_object(login_serializer.data['email'])
+            user = login_serializer.validated_data['user']
 
-            response_serializer = self.retrieve_serializer_class(
-                user
+            response_serializer = compile_serializer(
+                self.retrieve_serializer_class
             )
 
-            return Response(response_serializer.data)
+            return Response(response_serializer.to_representation(user))
         return Response(
             login_serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
@@ -79,6 +105,10 @@ class CreateUserViewSet(mixins.CreateModelMixin,
     serializer_class = serializers.CreateUserSerializer
     create_serializer_class = serializers.CreateUserSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [IPThrottle, EmailThrottle]
+    throttle_scope = 'signup'
+
+    query_budgets = {'create': 2}
 
     def create(self, request, *args, **kwargs):
         """Creation of the user depending if is Staff or not"""
@@ -88,27 +118,10 @@ class CreateUserViewSet(mixins.CreateModelMixin,
         if create_serializer.is_valid():
             # Revisar webservice de AD
             data = create_serializer.data
-
-            email = data['email']
-            password = data['password']
-            extra_fields = {
-                'phone': data['phone'],
-                'last_name': data['last_name'],
-                'name': data['name'],
-                'is_staff': data['is_staff'],
-                'is_active': False
-            }
-
-            user = User.objects.create_user(
-                email=email,
-                password=password,
-                **extra_fields
-            )
-
-            user.save()
+            create_serializer.create(create_serializer.validated_data)
 
             return Response(
-                create_serializer.data,
+                data,
                 status=status.HTTP_201_CREATED
             )
         else:
@@ -118,21 +131,69 @@ class CreateUserViewSet(mixins.CreateModelMixin,
             )
 
 
-router.register(
-    r'auth',
-    AuthViewSet,
-    basename="auth",
-)
-
-router.register(
-    r'me',
-    ProfileViewSet,
-    basename="user_me",
-    router_class=SingleObjectRouter
-)
-
-router.register(
-    r'users/create',
-    CreateUserViewSet,
-    basename="user_create",
-)
+class ImportUserViewSet(viewsets.GenericViewSet, BaseGenericViewSet):
+    """Bulk creation of users from CSV or JSON Lines
+
+    WSGI-only, see `app.asgi_urls`.
+    """
+
+    serializer_class = ImportUserSerializer
+    permission_classes = [IsAdminUser]
+
+    formats = {
+        'text/csv': 'csv',
+        'application/jsonl': 'jsonl',
+        'application/x-ndjson': 'jsonl',
+    }
+
+    def create(self, request, *args, **kwargs):
+        """Import the rows of the body as they arrive, streaming back the
+        errors of each rejected row and a summary"""
+        media_type = request.content_type.split(';')[0].strip()
+        if media_type not in self.formats:
+            raise exceptions.UnsupportedMediaType(media_type)
+
+        stream = request.stream
+        lines = codecs.iterdecode(
+            iter(stream.readline, b'') if stream is not None else [],
+            'utf-8'
+        )
+        results = import_users(read_rows(lines, self.formats[media_type]))
+
+        return StreamingHttpResponse(
+            (json.dumps(result) + '\n' for result in results),
+            content_type='application/x-ndjson'
+        )
+
+
+class ExportUserViewSet(ChangesMixin,
+                        viewsets.GenericViewSet,
+                        BaseGenericViewSet):
+    """Export of every user as JSON Lines or CSV, and of the users changed
+    since a previous sync
+
+    The export of every user is WSGI-only, see `app.asgi_urls`.
+    """
+
+    queryset = User.objects.all()
+    serializer_class = serializers.UserExportSerializer
+    permission_classes = [IsAdminUser]
+    renderer_classes = [JSONLinesRenderer, CSVRenderer]
+
+    # One query per chunk of users, see users.exporters. The changes read
+    # the users, the tombstones and their content type once per process.
+    query_budgets = {'list': 2, 'changes': 3}
+
+    def list(self, request, *args, **kwargs):
+        """Stream the users as they are read, a chunk at a time"""
+        renderer = request.accepted_renderer
+        rows = iter_users()
+
+        response = StreamingHttpResponse(
+            EXPORTERS[renderer.format](rows),
+            content_type=renderer.media_type
+        )
+        response['Content-Disposition'] = (
+            'attachment; filename="users.{0}"'.format(renderer.format)
+        )
+        return response
@@ -0,0 +1,63 @@
+"""Streaming user export."""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from users.models import User
+
+EXPORT_FIELDS = (
+    'id', 'email', 'name', 'last_name', 'is_active', 'is_staff',
+    'is_superuser', 'last_login', 'created_date', 'last_modified'
+)
+
+
+def iter_users(chunk_size=1000, fields=EXPORT_FIELDS):
+    """
+    Yield the `fields` values of every user in email order.
+
+    Users are read a chunk at a time from the last email seen (keyset
+    iteration), so every query is an index range scan of `chunk_size` rows
+    whatever the position in the table.
+    """
+    queryset = User.objects.order_by('email').values_list('email', *fields)
+    last_email = None
+    while True:
+        chunk = queryset
+        if last_email is not None:
+            chunk = queryset.filter(email__gt=last_email)
+
+        rows = list(chunk[:chunk_size])
+        for row in rows:
+            yield row[1:]
+
+        if len(rows) < chunk_size:
+            return
+        last_email = rows[-1][0]
+
+
+class Echo(object):
+    """File-like object returning what is written to it."""
+
+    def write(self, value):
+        return value
+
+
+def export_csv(rows, fields=EXPORT_FIELDS):
+    """Yield the CSV lines of the header and the `rows`."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def export_jsonl(rows, fields=EXPORT_FIELDS):
+    """Yield a JSON line per row."""
+    for row in rows:
+        yield json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+EXPORTERS = {
+    'csv': export_csv,
+    'jsonl': export_jsonl,
+}
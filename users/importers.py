@@ -0,0 +1,142 @@
+"""Bulk user import."""
+import csv
+import json
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+
+from rest_framework import serializers
+
+from users.models import User
+from users.passwords import password_service
+
+FORMATS = ('csv', 'jsonl')
+
+
+class ImportUserSerializer(serializers.Serializer):
+    """Validate a single row of a user import."""
+
+    name = serializers.CharField(required=True, max_length=45)
+    last_name = serializers.CharField(required=True, max_length=45)
+    email = serializers.EmailField(required=True, max_length=254)
+    password = serializers.CharField(required=True)
+    is_staff = serializers.BooleanField(default=False)
+    is_active = serializers.BooleanField(default=False)
+
+    def validate_email(self, value):
+        """Normalize the email the way the user manager does."""
+        return User.objects.normalize_email(value)
+
+
+def read_rows(lines, format):
+    """
+    Yield one (row number, data) pair per record of the text `lines`, data
+    is `None` for records that can not be parsed.
+    """
+    if format == 'csv':
+        for number, row in enumerate(csv.DictReader(lines), start=1):
+            yield number, row
+        return
+
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield number, row if isinstance(row, dict) else None
+
+
+def _drop_registered(users, errors):
+    """
+    Move the (row number, data) pairs of `users` whose email is already
+    registered, or repeated in `users`, to `errors` with one query.
+    """
+    emails = [data['email'] for _, data in users]
+    # Compared lowercased, the way the unique LOWER(email) index does.
+    registered = set(
+        User.objects.annotate(
+            email_lower=Lower('email')
+        ).filter(email_lower__in=emails).values_list('email_lower', flat=True)
+    )
+
+    unique = []
+    for number, data in users:
+        if data['email'] in registered:
+            errors.append((
+                number,
+                {'email': ['Email has already been registered']}
+            ))
+            continue
+        registered.add(data['email'])
+        unique.append((number, data))
+    return unique
+
+
+def _create(users):
+    with transaction.atomic():
+        User.objects.bulk_create(User(**data) for _, data in users)
+
+
+def _import_chunk(rows, service):
+    """Create the valid users of `rows`, return the rejected ones."""
+    errors = []
+    users = []
+    for number, row in rows:
+        if row is None:
+            errors.append((number, {'non_field_errors': ['Invalid record']}))
+            continue
+
+        serializer = ImportUserSerializer(data=row)
+        if serializer.is_valid():
+            users.append((number, dict(serializer.validated_data)))
+        else:
+            errors.append((number, serializer.errors))
+
+    users = _drop_registered(users, errors)
+    passwords = service.hash_passwords(
+        [data['password'] for _, data in users]
+    )
+    for password, (_, data) in zip(passwords, users):
+        data['password'] = password
+
+    while users:
+        try:
+            _create(users)
+            break
+        except IntegrityError:
+            # Some emails were registered concurrently, drop them and retry
+            # until none is left. Report the rows if none was dropped.
+            remaining = _drop_registered(users, errors)
+            if len(remaining) == len(users):
+                errors.extend(
+                    (number, {'non_field_errors': ['User can not be saved']})
+                    for number, _ in users
+                )
+                remaining = []
+            users = remaining
+
+    return len(users), sorted(errors, key=lambda error: error[0])
+
+
+def import_users(rows, chunk_size=500, service=password_service):
+    """
+    Create the users of the (row number, data) pairs of `rows` a chunk at a
+    time and yield an error report per rejected row, then a summary.
+    """
+    rows = iter(rows)
+    created = rejected = 0
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+
+        count, errors = _import_chunk(chunk, service)
+        created += count
+        rejected += len(errors)
+        for number, row_errors in errors:
+            yield {'row': number, 'errors': row_errors}
+
+    yield {'created': created, 'rejected': rejected}
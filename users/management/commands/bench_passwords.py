@@ -0,0 +1,75 @@
+"""Measure login password verification throughput per worker count."""
+import threading
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+
+from users.passwords import PasswordService, PasswordServiceUnavailable
+
+
+class Command(BaseCommand):
+    help = (
+        'Report password verifications (logins) per second of the '
+        'PasswordService for several worker counts.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, nargs='+', default=[0, 1, 2, 4, 8]
+        )
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--logins', type=int, default=200)
+        parser.add_argument('--queue-size', type=int, default=64)
+
+    def handle(self, *args, **options):
+        encoded = make_password('bench-password')
+
+        self.stdout.write('workers  logins/s  rejected')
+        for workers in options['workers']:
+            service = PasswordService(
+                workers=workers,
+                queue_size=options['queue_size'],
+                timeout=60
+            )
+            # Start the pool before measuring.
+            service.verify('bench-password', encoded)
+
+            rate, rejected = self.run(
+                service, encoded, options['concurrency'], options['logins']
+            )
+            service.shutdown()
+            self.stdout.write(
+                '{0:>7}  {1:8.1f}  {2:8}'.format(workers, rate, rejected)
+            )
+
+    def run(self, service, encoded, concurrency, logins):
+        """Verify `logins` passwords from `concurrency` request threads."""
+        remaining = [logins]
+        rejected = [0]
+        lock = threading.Lock()
+
+        def request_thread():
+            while True:
+                with lock:
+                    if not remaining[0]:
+                        return
+                    remaining[0] -= 1
+                try:
+                    service.verify('bench-password', encoded)
+                except PasswordServiceUnavailable:
+                    with lock:
+                        rejected[0] += 1
+
+        threads = [
+            threading.Thread(target=request_thread)
+            for _ in range(concurrency)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        return (logins - rejected[0]) / elapsed, rejected[0]
@@ -0,0 +1,102 @@
+"""Compare the compiled permission backend with Django's ModelBackend."""
+import random
+
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+
+from users.backends import PermissionBackend, permission_cache
+from users.models import User
+
+from utils.benchmarks import benchmark_database, measure, summarize
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark has_perm checks of PermissionBackend against the stock '
+        'ModelBackend on a throwaway database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--permissions', type=int, default=5000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--checks', type=int, default=50)
+        parser.add_argument('--number', type=int, default=200)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            user = self.seed(options['permissions'], options['groups'])
+            perms = self.sample(options['checks'])
+
+            backends = [
+                ('ModelBackend', ModelBackend(), False),
+                ('PermissionBackend (cold)', PermissionBackend(), True),
+                ('PermissionBackend (warm)', PermissionBackend(), False),
+            ]
+            for label, backend, cold in backends:
+                self.run(label, backend, user, perms, cold, options['number'])
+
+    def seed(self, total, groups):
+        """Create `total` permissions shared between a user and its groups."""
+        content_type = ContentType.objects.get_for_model(User)
+        Permission.objects.bulk_create(
+            Permission(
+                name='Bench {0}'.format(i),
+                codename='bench_{0}'.format(i),
+                content_type=content_type
+            )
+            for i in range(total)
+        )
+        pks = list(
+            Permission.objects.filter(
+                codename__startswith='bench_'
+            ).values_list('pk', flat=True)
+        )
+
+        user = User.objects.create_user(
+            email='bench@example.com',
+            password='bench',
+            name='Bench'
+        )
+        user.user_permissions.set(pks[::2])
+
+        size = max(1, len(pks) // groups)
+        for i in range(groups):
+            group = Group.objects.create(name='bench {0}'.format(i))
+            group.permissions.set(pks[1::2][i * size:(i + 1) * size])
+            user.groups.add(group)
+
+        return user
+
+    def sample(self, checks):
+        """Return `checks` permission strings, half of them missing."""
+        present = [
+            'users.{0}'.format(codename)
+            for codename in Permission.objects.filter(
+                codename__startswith='bench_'
+            ).values_list('codename', flat=True)
+        ]
+        missing = ['users.missing_{0}'.format(i) for i in range(checks)]
+        return random.sample(present, checks // 2) + missing[:checks // 2]
+
+    def run(self, label, backend, user, perms, cold, number):
+        """Time the checks of one request: a fresh user object each time."""
+        def setup():
+            if cold:
+                permission_cache.clear()
+            return (User.objects.get(pk=user.pk),)
+
+        def check(request_user):
+            for perm in perms:
+                backend.has_perm(request_user, perm)
+
+        backend.has_perm(User.objects.get(pk=user.pk), perms[0])
+        samples, queries = measure(check, number=number, setup=setup)
+        stats = summarize(samples)
+        self.stdout.write(
+            '{0:<28} mean {1:8.3f} ms  p95 {2:8.3f} ms  '
+            '{3:5.1f} queries/request'.format(
+                label, stats['mean_ms'], stats['p95_ms'], queries
+            )
+        )
@@ -0,0 +1,111 @@
+"""Compare compiled serializers with DRF for the profile and login."""
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+
+from rest_framework.renderers import JSONRenderer
+
+from users.models import User
+from users.profile import PROFILE_PREFETCH
+from users.serializers import (
+    AuthResponseSerializer, GroupPermissionSerializer, UserProfileSerializer
+)
+
+from utils.benchmarks import benchmark_database, measure, summarize
+from utils.serializers import compile_serializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the profile, group and login serializers against their '
+        'compiled versions on a throwaway database, after checking both '
+        'render the same JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--permissions', type=int, default=50)
+        parser.add_argument('--groups', type=int, default=5)
+        parser.add_argument('--number', type=int, default=500)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            user = self.seed(options['permissions'], options['groups'])
+            user = User.objects.prefetch_related(*PROFILE_PREFETCH).get(
+                pk=user.pk
+            )
+            groups = list(user.groups.all())
+
+            cases = [
+                ('UserProfileSerializer', UserProfileSerializer, user, False),
+                ('GroupPermissionSerializer', GroupPermissionSerializer,
+                 groups, True),
+                ('AuthResponseSerializer', AuthResponseSerializer, user,
+                 False),
+            ]
+            for label, serializer_class, instance, many in cases:
+                self.run(label, serializer_class, instance, many,
+                         options['number'])
+
+    def seed(self, total, groups):
+        """Create a user with `total` permissions, half through groups."""
+        content_type = ContentType.objects.get_for_model(User)
+        Permission.objects.bulk_create(
+            Permission(
+                name='Bench {0}'.format(i),
+                codename='bench_{0}'.format(i),
+                content_type=content_type
+            )
+            for i in range(total)
+        )
+        pks = list(
+            Permission.objects.filter(
+                codename__startswith='bench_'
+            ).values_list('pk', flat=True)
+        )
+
+        user = User.objects.create_user(
+            email='bench@example.com',
+            password='bench',
+            name='Bench'
+        )
+        user.user_permissions.set(pks[::2])
+
+        size = max(1, len(pks) // 2 // groups)
+        for i in range(groups):
+            group = Group.objects.create(name='bench {0}'.format(i))
+            group.permissions.set(pks[1::2][i * size:(i + 1) * size])
+            user.groups.add(group)
+
+        return user
+
+    def run(self, label, serializer_class, instance, many, number):
+        """Check the outputs are the same, then time both."""
+        compiled = compile_serializer(serializer_class)
+        if many:
+            def serialize(instance):
+                return serializer_class(instance, many=True).data
+
+            fast = compiled.many
+        else:
+            def serialize(instance):
+                return serializer_class(instance).data
+
+            fast = compiled.to_representation
+
+        renderer = JSONRenderer()
+        if (renderer.render(serialize(instance))
+                != renderer.render(fast(instance))):
+            raise CommandError(
+                'The compiled {0} renders different data.'.format(label)
+            )
+
+        for variant, func in (('DRF', serialize), ('compiled', fast)):
+            samples, _ = measure(
+                func, number=number, setup=lambda: (instance,)
+            )
+            stats = summarize(samples)
+            self.stdout.write(
+                '{0:<26} {1:<9} mean {2:8.3f} ms  p95 {3:8.3f} ms'.format(
+                    label, variant, stats['mean_ms'], stats['p95_ms']
+                )
+            )
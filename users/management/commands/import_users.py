@@ -0,0 +1,53 @@
+"""Import users from a CSV or JSON Lines file."""
+import json
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.importers import FORMATS, import_users, read_rows
+from users.passwords import PasswordService, password_service
+
+
+class Command(BaseCommand):
+    help = (
+        'Create the users of a CSV or JSON Lines file in chunks, printing a '
+        'JSON line per rejected row and a summary.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, '-' for stdin.")
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument(
+            '--workers', type=int,
+            help='Processes hashing the passwords.'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format']
+        if format is None:
+            extension = os.path.splitext(path)[1].lstrip('.').lower()
+            format = 'jsonl' if extension in ('jsonl', 'ndjson') else extension
+        if format not in FORMATS:
+            raise CommandError('Unknown format, use --format.')
+
+        service = password_service
+        if options['workers'] is not None:
+            service = PasswordService(workers=options['workers'])
+
+        lines = sys.stdin if path == '-' else open(path, newline='')
+        try:
+            results = import_users(
+                read_rows(lines, format),
+                chunk_size=options['chunk_size'],
+                service=service
+            )
+            for result in results:
+                self.stdout.write(json.dumps(result))
+        finally:
+            if lines is not sys.stdin:
+                lines.close()
+            if service is not password_service:
+                service.shutdown()
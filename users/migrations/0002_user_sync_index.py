@@ -0,0 +1,17 @@
+# Generated by Django 3.2 on 2026-10-18 16:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['last_modified', 'id'], name='users_user_sync'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 3.2 on 2026-10-18 16:10
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+# Indexes of the UPPER(email) the case insensitive lookups compare on
+# PostgreSQL: a prefix index for istartswith and a trigram index for
+# icontains. Built without locking the table, so outside a transaction.
+SEARCH_INDEXES = (
+    ('users_user_email_upper_prefix',
+     'btree ((UPPER("email"::text)) text_pattern_ops)'),
+    ('users_user_email_upper_trgm',
+     'gin ((UPPER("email"::text)) gin_trgm_ops)'),
+)
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, definition in SEARCH_INDEXES:
+        schema_editor.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS {0} '
+            'ON "users_user" USING {1}'.format(name, definition)
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in SEARCH_INDEXES:
+        schema_editor.execute(
+            'DROP INDEX CONCURRENTLY IF EXISTS {0}'.format(name)
+        )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('users', '0002_user_sync_index'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(is_staff=True), fields=['email'], name='users_user_staff_email'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(is_superuser=True), fields=['email'], name='users_user_superuser_email'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(is_active=False), fields=['email'], name='users_user_inactive_email'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 3.2 on 2026-10-18 16:20
+
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def lowercase_emails(apps, schema_editor):
+    """
+    Store the emails in lowercase, as users.models.UserManager now saves
+    them. Fails, listing them, if some users only differ by the case of
+    their email: they have to be merged or renamed by hand first.
+    """
+    User = apps.get_model('users', 'User')
+    users = User.objects.using(schema_editor.connection.alias)
+
+    duplicates = list(
+        users.annotate(email_lower=Lower('email'))
+        .values('email_lower')
+        .annotate(count=Count('pk'))
+        .filter(count__gt=1)
+        .order_by('email_lower')
+        .values_list('email_lower', flat=True)
+    )
+    if duplicates:
+        clashes = users.annotate(email_lower=Lower('email')).filter(
+            email_lower__in=duplicates
+        ).order_by('email_lower', 'pk')
+        raise RuntimeError(
+            'Users whose emails only differ by their case, merge or rename '
+            'them before migrating:\n{0}'.format('\n'.join(
+                '  {0} (id {1})'.format(user.email, user.pk)
+                for user in clashes
+            ))
+        )
+
+    users.exclude(email=Lower('email')).update(email=Lower('email'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_admin_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(lowercase_emails, migrations.RunPython.noop),
+        # Emails are unique whatever their case, and looked up by
+        # LOWER(email), see users.models.UserQuerySet.by_email.
+        migrations.RunSQL(
+            'CREATE UNIQUE INDEX users_user_email_lower '
+            'ON users_user (LOWER(email))',
+            'DROP INDEX users_user_email_lower',
+        ),
+    ]
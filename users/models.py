@@ -4,15 +4,39 @@ from django.contrib.auth.models import (
     PermissionsMixin
 )
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Lower
 
 from utils.models import TimeStampedMixin
 
 
-class UserManager(BaseUserManager):
+class UserQuerySet(models.QuerySet):
+    """Queries of users"""
+
+    def by_email(self, email):
+        """Filter the user of `email` whatever its case, an index probe of
+        the unique LOWER(email) index."""
+        return self.alias(email_lower=Lower('email')).filter(
+            email_lower=Lower(Value(email))
+        )
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
     "Custom user manager"
 
     use_in_migrations = True
 
+    @classmethod
+    def normalize_email(cls, email):
+        """Lowercase the whole email, emails are unique whatever their case"""
+        return super(UserManager, cls).normalize_email(email).lower()
+
+    def get_by_email(self, email):
+        return self.by_email(email).get()
+
+    def get_by_natural_key(self, username):
+        return self.get_by_email(username)
+
     def _create_user(self, email, password=None, **extra_fields):
         """Internal function to create and save a user
            with the given email and password"""
@@ -44,12 +68,31 @@ class UserManager(BaseUserManager):
 class User(AbstractBaseUser, PermissionsMixin, TimeStampedMixin):
     """Custom user model to be used accross the app"""
 
-    class Meta:
+    class Meta(TimeStampedMixin.Meta):
         """Define the behavior of Model."""
 
         verbose_name = 'Usuario'
         verbose_name_plural = 'Usuarios'
         ordering = ('email',)
+        # The rare flags filtered on by the admin, in email order. The
+        # case insensitive email search indexes are in the migrations.
+        indexes = TimeStampedMixin.Meta.indexes + [
+            models.Index(
+                fields=['email'],
+                name='users_user_staff_email',
+                condition=models.Q(is_staff=True)
+            ),
+            models.Index(
+                fields=['email'],
+                name='users_user_superuser_email',
+                condition=models.Q(is_superuser=True)
+            ),
+            models.Index(
+                fields=['email'],
+                name='users_user_inactive_email',
+                condition=models.Q(is_active=False)
+            ),
+        ]
 
     email = models.EmailField(
         max_length=254,
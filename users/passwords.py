@@ -0,0 +1,163 @@
+"""Password verification outside of the request worker."""
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from utils.concurrency import database_sync_to_async
+
+
+class PasswordServiceUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many logins in progress, try again later.'
+    default_code = 'password_service_unavailable'
+
+
+def _setup_worker(settings_module):
+    """Configure Django in a freshly started worker process."""
+    import django
+
+    if settings_module:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()
+
+
+def verify_password(password, encoded):
+    """
+    Return a two-tuple with whether `password` matches `encoded` and, when
+    the hasher settings changed since it was hashed, the new encoded
+    password (otherwise `None`).
+    """
+    rehashed = []
+
+    def setter(raw_password):
+        rehashed.append(make_password(raw_password))
+
+    is_correct = check_password(password, encoded, setter)
+    return is_correct, rehashed[0] if rehashed else None
+
+
+class PasswordService(object):
+    """
+    Verify passwords in a pool of `workers` processes.
+
+    At most `workers + queue_size` verifications are in flight; any call
+    beyond that, or one that does not finish within `timeout` seconds,
+    raises `PasswordServiceUnavailable`. With no workers passwords are
+    verified in the calling thread.
+    """
+
+    def __init__(self, workers=0, queue_size=64, timeout=5.0):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        initializer=_setup_worker,
+                        initargs=(
+                            os.environ.get('DJANGO_SETTINGS_MODULE'),
+                        )
+                    )
+        return self._executor
+
+    def shutdown(self):
+        """Stop the worker processes."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def _submit(self, password, encoded):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordServiceUnavailable()
+
+        try:
+            future = self.executor.submit(verify_password, password, encoded)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        # The slot is held until the worker is done, even after a timeout.
+        future.add_done_callback(lambda f: self._slots.release())
+        return future
+
+    def verify(self, password, encoded):
+        """Blocking version of `verify_password`."""
+        if not self.workers:
+            return verify_password(password, encoded)
+
+        future = self._submit(password, encoded)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise PasswordServiceUnavailable()
+
+    def hash_passwords(self, passwords):
+        """Return the encoded form of every password, hashed in parallel."""
+        if not self.workers:
+            return [make_password(password) for password in passwords]
+
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        return list(
+            self.executor.map(make_password, passwords, chunksize=chunksize)
+        )
+
+    async def averify(self, password, encoded):
+        """Coroutine version of `verify_password`."""
+        loop = asyncio.get_running_loop()
+        if not self.workers:
+            return await loop.run_in_executor(
+                None, verify_password, password, encoded
+            )
+
+        future = asyncio.wrap_future(self._submit(password, encoded))
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            raise PasswordServiceUnavailable()
+
+
+password_service = PasswordService(
+    workers=settings.PASSWORD_VERIFIER_WORKERS,
+    queue_size=settings.PASSWORD_VERIFIER_QUEUE_SIZE,
+    timeout=settings.PASSWORD_VERIFIER_TIMEOUT
+)
+
+
+def _save_rehashed(user, encoded):
+    user.password = encoded
+    user.save(update_fields=['password'])
+
+
+def check_user_password(user, password):
+    """Check the password of `user`, upgrading its hash if needed."""
+    is_correct, rehashed = password_service.verify(password, user.password)
+    if rehashed is not None:
+        _save_rehashed(user, rehashed)
+    return is_correct
+
+
+async def acheck_user_password(user, password):
+    """Coroutine version of `check_user_password`."""
+    is_correct, rehashed = await password_service.averify(
+        password, user.password
+    )
+    if rehashed is not None:
+        await database_sync_to_async(_save_rehashed)(user, rehashed)
+    return is_correct
@@ -0,0 +1,117 @@
+"""Cached profile payloads."""
+import hashlib
+import json
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.cache import caches
+from django.db.models import Prefetch, prefetch_related_objects
+from django.utils.http import parse_etags
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from users.serializers import UserProfileSerializer
+
+from utils.principals import TokenUser
+from utils.serializers import compile_serializer
+
+# Loads the whole permission graph of a user in three queries.
+PROFILE_PREFETCH = (
+    'user_permissions',
+    Prefetch(
+        'groups',
+        queryset=Group.objects.prefetch_related('permissions')
+    ),
+)
+
+ALL_USERS = 'all'
+
+
+class ProfileCache(object):
+    """
+    User pk -> (etag, payload) of the profile endpoint, in the Django cache
+    named by `PROFILE_CACHE` so that every server process sees the same
+    entries and invalidations.
+
+    Entries are stamped with a version of their user and one of all users,
+    which `invalidate()` and `clear()` replace. An entry loaded while its
+    user changed keeps the old stamp, so it is never served.
+    """
+
+    prefix = 'profile'
+
+    def __init__(self, alias, timeout):
+        self.alias = alias
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def version_key(self, tag):
+        return '{0}:version:{1}'.format(self.prefix, tag)
+
+    def entry_key(self, pk):
+        return '{0}:{1}'.format(self.prefix, pk)
+
+    def get(self, pk):
+        """Return the entry of `pk` or `None`, and the current stamp."""
+        version_keys = [self.version_key(ALL_USERS), self.version_key(pk)]
+        values = self.cache.get_many(version_keys + [self.entry_key(pk)])
+        if not all(key in values for key in version_keys):
+            # Versions are never missing from a stamp: an entry stamped
+            # before an evicted version would come back to life.
+            for key in version_keys:
+                self.cache.add(key, uuid.uuid4().hex, timeout=None)
+            return None, tuple(self.cache.get_many(version_keys).get(key)
+                               for key in version_keys)
+
+        stamp = tuple(values[key] for key in version_keys)
+        entry = values.get(self.entry_key(pk))
+        if entry is not None and entry[0] == stamp:
+            return entry[1], stamp
+        return None, stamp
+
+    def set(self, pk, entry, stamp):
+        self.cache.set(self.entry_key(pk), (stamp, entry), self.timeout)
+
+    def invalidate(self, pk):
+        """Drop the entry of `pk`, in every process."""
+        self.cache.set(self.version_key(pk), uuid.uuid4().hex, None)
+
+    def clear(self):
+        """Drop every entry, in every process."""
+        self.invalidate(ALL_USERS)
+
+
+profile_cache = ProfileCache(
+    settings.PROFILE_CACHE, settings.PROFILE_CACHE_TTL
+)
+
+
+def make_etag(data):
+    """Return a strong ETag for the given payload."""
+    content = json.dumps(data, cls=JSONEncoder, sort_keys=True)
+    return '"{0}"'.format(hashlib.md5(content.encode()).hexdigest())
+
+
+def is_fresh(request, etag):
+    """Return whether the client already has the payload tagged `etag`."""
+    etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    return etag in etags or '*' in etags
+
+
+def get_profile(user):
+    """Return the (etag, payload) pair of the profile of `user`."""
+    entry, stamp = profile_cache.get(user.pk)
+    if entry is None:
+        if isinstance(user, TokenUser):
+            user = user.get_user()
+        prefetch_related_objects([user], *PROFILE_PREFETCH)
+        data = compile_serializer(UserProfileSerializer).to_representation(
+            user
+        )
+        entry = (make_etag(data), data)
+        profile_cache.set(user.pk, entry, stamp)
+    return entry
@@ -0,0 +1,40 @@
+"""User API routes.
+
+Viewsets are referenced by dotted path, `users.api` is only imported when
+the API URLs are first needed (the first request resolved or URL reversed),
+not at startup.
+"""
+from app.urls import router
+
+from utils.routers import SingleObjectRouter
+
+router.register(
+    r'auth',
+    'users.api.AuthViewSet',
+    basename="auth",
+)
+
+router.register(
+    r'me',
+    'users.api.ProfileViewSet',
+    basename="user_me",
+    router_class=SingleObjectRouter
+)
+
+router.register(
+    r'users/create',
+    'users.api.CreateUserViewSet',
+    basename="user_create",
+)
+
+router.register(
+    r'users/import',
+    'users.api.ImportUserViewSet',
+    basename="user_import",
+)
+
+router.register(
+    r'users/export',
+    'users.api.ExportUserViewSet',
+    basename="user_export",
+)
@@ -1,10 +1,11 @@
 """Serializer for user API."""
-from django.contrib.auth.base_user import BaseUserManager
 from django.contrib.auth.models import Group, Permission
 
 from rest_framework import serializers
 
+from users.exporters import EXPORT_FIELDS
 from users.models import User
+from users.passwords import check_user_password
 
 from utils.tokens import create_token
 
@@ -55,14 +56,21 @@ class AuthSerializer(serializers.Serializer):
     email = serializers.CharField(required=True)
     password = serializers.CharField(required=True)
 
-    def validate(self, data):
-        """Validation username, password and active status"""
+    # Columns needed to check the password and build the login response.
+    user_fields = (
+        'id', 'email', 'password', 'is_active', 'is_staff', 'is_superuser'
+    )
+
+    def get_user(self, email):
+        """Return the user trying to log in."""
         try:
-            user = User.objects.get(email__exact=data.get('email'))
+            return User.objects.only(*self.user_fields).by_email(email).get()
         except User.DoesNotExist:
             raise serializers.ValidationError("credentials are not valid")
 
-        if not user.check_password(data.get('password')):
+    def check_user(self, user, is_correct_password):
+        """Raise ValidationError if the user can not log in."""
+        if not is_correct_password:
             raise serializers.ValidationError("credentials are not valid")
 
         if not user.is_active:
@@ -70,6 +78,18 @@ class AuthSerializer(serializers.Serializer):
                 'The user has not been activated'
             )
 
+    def validate(self, data):
+        """Validation username, password and active status.
+
+        The resolved user is returned as `user` in the validated data.
+        """
+        user = self.get_user(data.get('email'))
+        self.check_user(
+            user,
+            check_user_password(user, data.get('password'))
+        )
+
+        data['user'] = user
         return data
 
 
@@ -102,10 +122,31 @@ class CreateUserSerializer(serializers.Serializer):
 
     def validate_email(self, value):
         """Raise ValidationError if email already exists"""
-        email = BaseUserManager.normalize_email(value)
-        if User.objects.filter(email__exact=email).exists():
+        email = User.objects.normalize_email(value)
+        if User.objects.by_email(email).exists():
             raise serializers.ValidationError(
                 "Email has already been registered"
             )
         else:
-            return value
+            return email
+
+    def create(self, validated_data):
+        """Create the user, inactive until it is reviewed."""
+        return User.objects.create_user(
+            email=validated_data['email'],
+            password=validated_data['password'],
+            name=validated_data['name'],
+            last_name=validated_data['last_name'],
+            is_staff=validated_data['is_staff'],
+            is_active=False
+        )
+
+
+class UserExportSerializer(serializers.ModelSerializer):
+    """Serializer for the users sent by the delta sync."""
+
+    class Meta:
+        """Define behaivor."""
+
+        model = User
+        fields = EXPORT_FIELDS
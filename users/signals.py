@@ -0,0 +1,73 @@
+"""Signal receivers for the user model."""
+from django.contrib.auth.models import Group, Permission
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from users.backends import (
+    permission_cache, permission_index, version_cache
+)
+from users.models import User
+from users.profile import profile_cache
+
+from utils.authentication import user_cache
+
+# Caches holding entries tagged with the pk of the user they belong to.
+USER_CACHES = (user_cache, profile_cache, permission_cache, version_cache)
+
+# Caches holding entries derived from groups and permissions.
+PERMISSION_CACHES = (profile_cache, permission_cache, version_cache)
+
+
+def invalidate_users(pks):
+    """Drop every cached entry derived from the given users."""
+    for cache in USER_CACHES:
+        if pks is None:
+            cache.clear()
+        else:
+            for pk in pks:
+                cache.invalidate(pk)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    """Invalidate the caches of a saved or deleted user."""
+    invalidate_users([instance.pk])
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def user_relations_changed(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    """Invalidate the caches of users whose groups or permissions changed.
+
+    When the relation is cleared from the group or permission side the
+    affected users are unknown, so every entry is dropped.
+    """
+    if not action.startswith('post_'):
+        return
+
+    if not reverse:
+        invalidate_users([instance.pk])
+    else:
+        invalidate_users(pk_set)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def permission_graph_changed(sender, **kwargs):
+    """Drop cached permission data when a group or permission changes."""
+    if sender is Permission:
+        permission_index.reset()
+    for cache in PERMISSION_CACHES:
+        cache.clear()
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_permissions_changed(sender, action, **kwargs):
+    """Drop cached permission data when the permissions of a group change."""
+    if action.startswith('post_'):
+        for cache in PERMISSION_CACHES:
+            cache.clear()
@@ -1,3 +1,945 @@
-from django.test import TestCase
+import asyncio
+import json
+import sys
+import threading
+from concurrent.futures import Future
+from importlib import import_module
+from unittest import mock
 
-# Create your tests here.
+from app.urls import router
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, check_password
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
+from django.core.handlers.asgi import ASGIHandler
+from django.db import IntegrityError, connection
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, TransactionTestCase,
+    override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+import jwt
+
+from rest_framework import serializers as drf_serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from users import importers, passwords, serializers, views
+from users.backends import (
+    PermissionBackend, PermissionIndex, permission_cache, permission_index,
+    permission_version
+)
+from users.models import User
+from users.profile import (
+    PROFILE_PREFETCH, ProfileCache, get_profile, profile_cache
+)
+from users.signals import invalidate_users
+
+from utils.authentication import user_cache
+from utils.benchmarks import call_asgi, without_throttling
+from utils.serializers import compile_serializer
+from utils.testing import QueryBudgetMixin
+from utils.throttling import BucketStore
+from utils.tokens import create_token
+
+
+class RouteQueryBudgetTestCase(QueryBudgetMixin, APITestCase):
+    """The routes of the API run a bounded number of queries."""
+
+    router = router
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='staff@example.com',
+            password='secret',
+            name='Staff',
+            is_staff=True
+        )
+        self.token = create_token(self.user)
+        self.content_type = ContentType.objects.get_for_model(User)
+
+    def seed(self, size):
+        """Add `size` users, and `size` groups and permissions to the
+        requesting user."""
+        User.objects.bulk_create(
+            User(email='user{0}-{1}@example.com'.format(size, i), name='User')
+            for i in range(size)
+        )
+        for i in range(size):
+            permission = Permission.objects.create(
+                name='Budget {0}-{1}'.format(size, i),
+                codename='budget_{0}_{1}'.format(size, i),
+                content_type=self.content_type
+            )
+            group = Group.objects.create(name='budget {0}-{1}'.format(size, i))
+            group.permissions.add(permission)
+            self.user.groups.add(group)
+            self.user.user_permissions.add(permission)
+
+    def get_request(self, name, action, size):
+        if name == 'auth-list':
+            data = {'email': self.user.email, 'password': 'secret'}
+            return data, {}, {}
+        if name == 'user_create-list':
+            data = {
+                'email': 'new{0}@example.com'.format(size),
+                'password': 'secret',
+                'name': 'New',
+                'last_name': 'User',
+                'is_staff': False,
+            }
+            return data, {}, {}
+        if name == 'user_import-list':
+            # Streams its body in, see users.importers.
+            return None
+
+        headers = {'HTTP_AUTHORIZATION': 'Bearer {0}'.format(self.token)}
+        return {}, headers, {}
+
+    def reset(self):
+        invalidate_users(None)
+
+
+@override_settings(JWT_EMBED_CLAIMS=True)
+class EmbeddedClaimsQueryBudgetTestCase(RouteQueryBudgetTestCase):
+    """The same budgets hold with tokens carrying their claims."""
+
+    def get_request(self, name, action, size):
+        self.login = name == 'auth-list'
+        # A token made by a login after the data changed.
+        self.token = create_token(User.objects.get(pk=self.user.pk))
+        return super(EmbeddedClaimsQueryBudgetTestCase, self).get_request(
+            name, action, size
+        )
+
+    def reset(self):
+        super(EmbeddedClaimsQueryBudgetTestCase, self).reset()
+        if not self.login:
+            # Cached by the login that made the token, while the login
+            # itself computes it.
+            permission_version(User.objects.get(pk=self.user.pk))
+
+
+class UserAdminChangelistTestCase(TestCase):
+    """The user changelist runs a fixed number of queries."""
+
+    # Session, user, groups of the filter, count and page.
+    budget = 5
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email='admin@example.com',
+            password='secret',
+            name='Admin'
+        )
+        self.group = Group.objects.create(name='staff')
+        self.client.force_login(self.admin)
+
+    def test_query_budget(self):
+        url = reverse('admin:users_user_changelist')
+        queries = [
+            '',
+            '?is_staff__exact=1',
+            '?is_superuser__exact=1',
+            '?is_active__exact=0',
+            '?groups__id__exact={0}'.format(self.group.pk),
+            '?q=us',
+            '?q=user1',
+        ]
+        for size in (1, 50):
+            User.objects.bulk_create(
+                User(
+                    email='user{0}-{1}@example.com'.format(size, i),
+                    name='User',
+                    is_staff=i % 2 == 0
+                )
+                for i in range(size)
+            )
+            for query in queries:
+                with self.subTest(size=size, query=query):
+                    with CaptureQueriesContext(connection) as captured:
+                        response = self.client.get(url + query)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertLessEqual(len(captured), self.budget)
+
+
+class EmailCaseTestCase(APITestCase):
+    """Emails identify users whatever their case."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='Mixed.Case@Example.com',
+            password='secret',
+            name='User'
+        )
+
+    def test_normalized_to_lowercase(self):
+        self.assertEqual(self.user.email, 'mixed.case@example.com')
+
+    def test_login_with_other_case(self):
+        response = self.client.post(
+            reverse('auth-list'),
+            {'email': 'MIXED.case@example.COM', 'password': 'secret'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['email'], self.user.email)
+
+    def test_signup_with_other_case(self):
+        response = self.client.post(
+            reverse('user_create-list'),
+            {
+                'email': 'MIXED.CASE@example.com',
+                'password': 'secret',
+                'name': 'Other',
+                'last_name': 'User',
+                'is_staff': False,
+            },
+            format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_lookup_uses_lower_email(self):
+        with CaptureQueriesContext(connection) as captured:
+            User.objects.get_by_email('MIXED.CASE@EXAMPLE.COM')
+        self.assertEqual(len(captured), 1)
+        self.assertIn('LOWER(', captured[0]['sql'].upper())
+
+
+class PermissionIndexTestCase(SimpleTestCase):
+    """The permission index may be reset while it is read."""
+
+    rows = [(1, 'users', 'add_user'), (2, 'users', 'view_user')]
+
+    def setUp(self):
+        permissions = mock.patch('users.backends.Permission')
+        permission = permissions.start()
+        self.addCleanup(permissions.stop)
+        permission.objects.values_list.return_value.order_by \
+            .return_value = self.rows
+
+    def test_reset_during_lookup(self):
+        index = PermissionIndex()
+        load = index._load
+
+        def load_then_reset():
+            # Another thread resets the index as soon as it is loaded.
+            result = load()
+            thread = threading.Thread(target=index.reset)
+            thread.start()
+            thread.join()
+            return result
+
+        lookups = [
+            (index.bit, ('users.view_user',), 2),
+            (index.app_mask, ('users',), 0b110),
+            (index.all_mask, (), 0b110),
+            (index.names, (0b10,), {'users.add_user'}),
+        ]
+        with mock.patch.object(index, '_load', side_effect=load_then_reset):
+            for lookup, args, expected in lookups:
+                self.assertEqual(lookup(*args), expected)
+
+    def test_concurrent_reset_and_lookups(self):
+        index = PermissionIndex()
+        errors = []
+        rounds = 2000
+
+        def read():
+            try:
+                for _ in range(rounds):
+                    self.assertEqual(index.bit('users.view_user'), 2)
+                    self.assertEqual(index.app_mask('users'), 0b110)
+                    self.assertEqual(index.all_mask(), 0b110)
+                    self.assertEqual(index.names(0b10), {'users.add_user'})
+            except Exception as e:
+                errors.append(e)
+
+        def reset():
+            for _ in range(rounds):
+                index.reset()
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=read) for _ in range(3)]
+            threads.append(threading.Thread(target=reset))
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+
+        self.assertEqual(errors, [])
+
+
+class ImportRetryTestCase(TestCase):
+    """Rows registered while a chunk is imported are reported, not fatal."""
+
+    def setUp(self):
+        self.rows = [
+            (number, {
+                'email': 'import{0}@example.com'.format(number),
+                'password': 'secret',
+                'name': 'Import',
+                'last_name': 'User',
+            })
+            for number in range(1, 5)
+        ]
+        self.create = importers._create
+
+    def import_users(self, create):
+        with mock.patch.object(importers, '_create', side_effect=create):
+            return list(importers.import_users(iter(self.rows)))
+
+    def test_registered_concurrently(self):
+        concurrent = ['import2@example.com', 'import3@example.com']
+
+        def create(users):
+            # Every attempt but the last loses a race for one email.
+            if concurrent:
+                User.objects.create_user(concurrent.pop(0), name='Racer')
+                raise IntegrityError()
+            self.create(users)
+
+        results = self.import_users(create)
+
+        self.assertEqual([result.get('row') for result in results[:-1]],
+                         [2, 3])
+        self.assertEqual(results[-1], {'created': 2, 'rejected': 2})
+        self.assertTrue(
+            User.objects.filter(email='import4@example.com').exists()
+        )
+
+    def test_unexpected_integrity_error(self):
+        def create(users):
+            raise IntegrityError()
+
+        results = self.import_users(create)
+
+        self.assertEqual(results[-1], {'created': 0, 'rejected': 4})
+
+
+class UserDetailSerializer(drf_serializers.ModelSerializer):
+    """Fields the compiled serializers handle apart."""
+
+    login = drf_serializers.DateTimeField(source='last_login')
+    address = drf_serializers.CharField(source='email')
+    groups = serializers.GroupPermissionSerializer(many=True)
+    initials = drf_serializers.SerializerMethodField()
+
+    class Meta:
+        model = User
+        fields = ['id', 'login', 'address', 'is_staff', 'groups', 'initials']
+
+    def get_initials(self, obj):
+        return ''.join(part[:1] for part in obj.name.split())
+
+
+class CompiledSerializerTestCase(TestCase):
+    """Compiled serializers render the same JSON as DRF."""
+
+    def setUp(self):
+        content_type = ContentType.objects.get_for_model(User)
+        permissions = [
+            Permission.objects.create(
+                name='Compiled {0}'.format(i),
+                codename='compiled_{0}'.format(i),
+                content_type=content_type
+            )
+            for i in range(4)
+        ]
+        self.user = User.objects.create_user(
+            email='user@example.com',
+            password='secret',
+            name='Some User'
+        )
+        self.user.user_permissions.set(permissions[:2])
+        for i in range(2):
+            group = Group.objects.create(name='group {0}'.format(i))
+            group.permissions.set(permissions[i + 2:])
+            self.user.groups.add(group)
+
+    def get_user(self):
+        return User.objects.prefetch_related(*PROFILE_PREFETCH).get(
+            pk=self.user.pk
+        )
+
+    def assertSameOutput(self, serializer_class, instance, many=False):
+        compiled = compile_serializer(serializer_class)
+        if many:
+            expected = serializer_class(instance, many=True).data
+            actual = compiled.many(instance)
+        else:
+            expected = serializer_class(instance).data
+            actual = compiled.to_representation(instance)
+
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(actual), renderer.render(expected))
+
+    def test_profile(self):
+        self.assertSameOutput(
+            serializers.UserProfileSerializer, self.get_user()
+        )
+
+    def test_groups(self):
+        groups = list(self.get_user().groups.all())
+        self.assertSameOutput(
+            serializers.GroupPermissionSerializer, groups, many=True
+        )
+
+    def test_auth_response(self):
+        with mock.patch.object(
+            serializers, 'create_token', return_value='token'
+        ):
+            self.assertSameOutput(
+                serializers.AuthResponseSerializer, self.user
+            )
+
+    def test_sources_and_none(self):
+        user = User.objects.create_user(
+            email='other@example.com',
+            password='secret',
+            name='Other'
+        )
+        self.assertIsNone(user.last_login)
+        self.assertSameOutput(UserDetailSerializer, user)
+
+        self.user.last_login = timezone.now()
+        self.user.save()
+        self.assertSameOutput(UserDetailSerializer, self.get_user())
+        self.assertSameOutput(
+            UserDetailSerializer, [user, self.get_user()], many=True
+        )
+
+
+@override_settings(REST_FRAMEWORK=dict(
+    settings.REST_FRAMEWORK,
+    DEFAULT_THROTTLE_RATES={
+        'login_ip': '3/m',
+        'login_email': '1/m',
+        'signup_ip': '100/h',
+        'signup_email': '1/h',
+    }
+))
+class ThrottleTestCase(APITestCase):
+    """The DRF and the async views share the same throttles."""
+
+    def setUp(self):
+        store = mock.patch(
+            'utils.throttling.get_store', return_value=BucketStore(size=64)
+        )
+        store.start()
+        self.addCleanup(store.stop)
+
+    def login(self, email):
+        return self.client.post(
+            reverse('auth-list'),
+            {'email': email, 'password': 'wrong'},
+            format='json'
+        )
+
+    def signup(self, email):
+        return self.client.post(
+            reverse('user_create-list'),
+            {
+                'email': email,
+                'password': 'secret',
+                'name': 'User',
+                'last_name': 'User',
+                'is_staff': False,
+            },
+            format='json'
+        )
+
+    def call_async(self, view, path, data):
+        request = RequestFactory().post(
+            path, json.dumps(data), content_type='application/json'
+        )
+        return asyncio.run(view(request))
+
+    def assertThrottled(self, response):
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+    def test_login_by_email(self):
+        self.assertEqual(self.login('user@example.com').status_code, 400)
+        self.assertThrottled(self.login('USER@example.com'))
+        self.assertEqual(self.login('other@example.com').status_code, 400)
+
+    def test_login_by_ip(self):
+        for i in range(3):
+            response = self.login('user{0}@example.com'.format(i))
+            self.assertEqual(response.status_code, 400)
+        self.assertThrottled(self.login('user3@example.com'))
+
+    def test_signup_by_email(self):
+        self.assertEqual(self.signup('new@example.com').status_code, 201)
+        self.assertThrottled(self.signup('new@example.com'))
+
+    def test_async_login(self):
+        self.login('user@example.com')
+        response = self.call_async(
+            views.login, '/api/auth',
+            {'email': 'user@example.com', 'password': 'wrong'}
+        )
+        self.assertThrottled(response)
+        self.assertIn('throttled', json.loads(response.content)['detail'])
+
+    def test_async_create_user(self):
+        self.signup('new@example.com')
+        response = self.call_async(
+            views.create_user, '/api/users/create',
+            {'email': 'new@example.com', 'password': 'secret'}
+        )
+        self.assertThrottled(response)
+
+    def test_without_throttling(self):
+        with without_throttling():
+            for _ in range(3):
+                response = self.login('user@example.com')
+                self.assertEqual(response.status_code, 400)
+
+
+class LowercaseEmailsMigrationTestCase(TestCase):
+    """The data step of the unique LOWER(email) index."""
+
+    migration = import_module('users.migrations.0004_email_lower_unique')
+
+    def create_user(self, email):
+        user = User.objects.create_user(
+            email=email.lower(),
+            password='secret',
+            name='User'
+        )
+        # Stored as it was before the emails were normalized.
+        User.objects.filter(pk=user.pk).update(email=email)
+        return user
+
+    def migrate(self):
+        self.migration.lowercase_emails(
+            apps, mock.Mock(connection=connection)
+        )
+
+    def test_lowercases(self):
+        user = self.create_user('Mixed.Case@Example.com')
+        self.create_user('other@example.com')
+        self.migrate()
+        user.refresh_from_db()
+        self.assertEqual(user.email, 'mixed.case@example.com')
+
+    def test_reports_collisions(self):
+        first = self.create_user('Same@Example.com')
+        second = self.create_user('same@example.com')
+        self.create_user('Other@Example.com')
+
+        with self.assertRaises(RuntimeError) as raised:
+            self.migrate()
+        message = str(raised.exception)
+        self.assertIn('Same@Example.com (id {0})'.format(first.pk), message)
+        self.assertIn('same@example.com (id {0})'.format(second.pk), message)
+        self.assertNotIn('Other', message)
+        self.assertTrue(User.objects.filter(email='Same@Example.com').exists())
+
+
+class ProfileTestCase(APITestCase):
+    """The profile is cached in the shared cache until its user changes."""
+
+    def setUp(self):
+        caches['default'].clear()
+        content_type = ContentType.objects.get_for_model(User)
+        self.permissions = [
+            Permission.objects.create(
+                name='Profile {0}'.format(i),
+                codename='profile_{0}'.format(i),
+                content_type=content_type
+            )
+            for i in range(3)
+        ]
+        self.group = Group.objects.create(name='group')
+        self.user = User.objects.create_user(
+            email='user@example.com',
+            password='secret',
+            name='User'
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Bearer {0}'.format(create_token(self.user))
+        )
+
+    def get_etag(self):
+        response = self.client.get('/api/me')
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_not_modified_without_serializing(self):
+        etag = self.get_etag()
+        with mock.patch('users.profile.compile_serializer') as compiled:
+            response = self.client.get('/api/me', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        compiled.assert_not_called()
+
+    def test_relation_changes(self):
+        changes = [
+            lambda: self.user.groups.add(self.group),
+            lambda: self.group.permissions.add(self.permissions[0]),
+            lambda: self.user.user_permissions.add(self.permissions[1]),
+            lambda: self.permissions[2].group_set.add(self.group),
+            lambda: self.group.user_set.clear(),
+        ]
+        etags = [self.get_etag()]
+        for change in changes:
+            change()
+            etags.append(self.get_etag())
+        self.assertEqual(len(set(etags)), len(etags))
+
+    def test_shared_entries(self):
+        other_process = ProfileCache('default', 300)
+        etag, _ = get_profile(self.user)
+        entry, _ = other_process.get(self.user.pk)
+        self.assertEqual(entry[0], etag)
+
+        profile_cache.invalidate(self.user.pk)
+        self.assertIsNone(other_process.get(self.user.pk)[0])
+
+        get_profile(self.user)
+        profile_cache.clear()
+        self.assertIsNone(other_process.get(self.user.pk)[0])
+
+    def test_stale_load_not_served(self):
+        def load(user):
+            # The user changes while their profile is being loaded.
+            profile_cache.invalidate(user.pk)
+            return load.original(user)
+
+        load.original = compile_serializer(
+            serializers.UserProfileSerializer
+        ).to_representation
+        compiled = mock.Mock(to_representation=load)
+        with mock.patch(
+            'users.profile.compile_serializer', return_value=compiled
+        ):
+            get_profile(self.user)
+        self.assertIsNone(profile_cache.get(self.user.pk)[0])
+
+    def test_prefetch_queries(self):
+        self.user.user_permissions.set(self.permissions)
+        groups = [
+            Group.objects.create(name='group {0}'.format(i))
+            for i in range(3)
+        ]
+        for group in groups:
+            group.permissions.set(self.permissions)
+        self.user.groups.set(groups)
+
+        other = User.objects.create_user(
+            email='other@example.com',
+            password='secret',
+            name='Other'
+        )
+        other.groups.add(self.group)
+
+        for user in (self.user, other):
+            caches['default'].clear()
+            user = User.objects.get(pk=user.pk)
+            with self.assertNumQueries(3):
+                get_profile(user)
+
+
+class PermissionBackendTestCase(TestCase):
+    """The compiled masks answer like `ModelBackend`."""
+
+    def setUp(self):
+        permission_cache.clear()
+        permission_index.reset()
+        content_type = ContentType.objects.get_for_model(User)
+        self.permissions = [
+            Permission.objects.create(
+                name='Backend {0}'.format(i),
+                codename='backend_{0}'.format(i),
+                content_type=content_type
+            )
+            for i in range(4)
+        ]
+        self.group = Group.objects.create(name='group')
+        self.group.permissions.set(self.permissions[:2])
+
+        self.user = self.create_user('user@example.com')
+        self.user.user_permissions.add(self.permissions[2])
+        self.user.groups.add(self.group)
+
+        self.names = [
+            'users.backend_{0}'.format(i) for i in range(4)
+        ] + ['auth.add_group', 'users.unknown']
+
+    def create_user(self, email, **kwargs):
+        return User.objects.create_user(
+            email=email, password='secret', name='User', **kwargs
+        )
+
+    def assertSameAnswers(self, pk):
+        backends = {
+            backend: User.objects.get(pk=pk)
+            for backend in (PermissionBackend(), ModelBackend())
+        }
+
+        def answers(backend, user):
+            return (
+                backend.get_user_permissions(user),
+                backend.get_group_permissions(user),
+                backend.get_all_permissions(user),
+                [backend.has_perm(user, name) for name in self.names],
+                [backend.has_module_perms(user, app)
+                 for app in ('users', 'auth', 'unknown')],
+            )
+
+        compiled, model = [
+            answers(backend, user) for backend, user in backends.items()
+        ]
+        self.assertEqual(compiled, model)
+
+    def test_same_as_model_backend(self):
+        users = [
+            self.user,
+            self.create_user('none@example.com'),
+            self.create_user('admin@example.com', is_superuser=True),
+            self.create_user('staff@example.com', is_staff=True),
+        ]
+        inactive = self.create_user('inactive@example.com')
+        inactive.user_permissions.add(self.permissions[0])
+        User.objects.filter(pk=inactive.pk).update(is_active=False)
+        users.append(inactive)
+
+        for user in users:
+            with self.subTest(email=user.email):
+                self.assertSameAnswers(user.pk)
+
+    def test_relation_changes(self):
+        user, group, permissions = self.user, self.group, self.permissions
+        changes = {
+            'user groups add': lambda: user.groups.add(
+                Group.objects.create(name='other')
+            ),
+            'user permissions add': lambda: user.user_permissions.add(
+                permissions[3]
+            ),
+            'group permissions remove': lambda: group.permissions.remove(
+                permissions[0]
+            ),
+            'permission groups add': lambda: permissions[3].group_set.add(
+                group
+            ),
+            'permission users remove': lambda: permissions[2].user_set.remove(
+                user
+            ),
+            'group users clear': lambda: group.user_set.clear(),
+            'group users add': lambda: group.user_set.add(user),
+            'permission users clear': lambda: permissions[3].user_set.clear(),
+            'group permissions clear': lambda: group.permissions.clear(),
+            'user permissions set': lambda: user.user_permissions.set(
+                permissions[1:]
+            ),
+            'user groups clear': lambda: user.groups.clear(),
+        }
+        self.assertSameAnswers(user.pk)
+        for name, change in changes.items():
+            with self.subTest(change=name):
+                change()
+                self.assertSameAnswers(user.pk)
+
+
+class FakeExecutor(object):
+    """Executor whose tasks run when the test says so."""
+
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, func, *args):
+        future = Future()
+        future.set_running_or_notify_cancel()
+        self.futures.append((future, func, args))
+        return future
+
+    def finish(self):
+        for future, func, args in self.futures:
+            future.set_result(func(*args))
+        self.futures = []
+
+
+def old_hash(password):
+    """Return `password` hashed with fewer iterations than the default."""
+    hasher = PBKDF2PasswordHasher()
+    return hasher.encode(password, hasher.salt(), iterations=1000)
+
+
+class PasswordServiceTestCase(SimpleTestCase):
+    """Passwords are verified in a bounded pool of workers."""
+
+    def make_service(self, **kwargs):
+        service = passwords.PasswordService(workers=1, **kwargs)
+        service._executor = FakeExecutor()
+        return service
+
+    def test_full(self):
+        service = self.make_service(queue_size=1)
+        encoded = old_hash('secret')
+        for _ in range(2):
+            service._submit('secret', encoded)
+
+        with self.assertRaises(passwords.PasswordServiceUnavailable) as e:
+            service.verify('secret', encoded)
+        self.assertEqual(e.exception.status_code, 503)
+
+        service.executor.finish()
+        service._submit('secret', encoded)
+
+    def test_timeout_holds_slot(self):
+        service = self.make_service(queue_size=0, timeout=0.01)
+        encoded = old_hash('secret')
+        with self.assertRaises(passwords.PasswordServiceUnavailable):
+            service.verify('secret', encoded)
+
+        # The worker still runs the timed out verification.
+        with self.assertRaises(passwords.PasswordServiceUnavailable):
+            service._submit('secret', encoded)
+        service.executor.finish()
+        self.assertEqual(len(service.executor.futures), 0)
+        service._submit('secret', encoded)
+
+    def test_async_timeout(self):
+        service = self.make_service(queue_size=0, timeout=0.01)
+        with self.assertRaises(passwords.PasswordServiceUnavailable):
+            asyncio.run(service.averify('secret', old_hash('secret')))
+
+    def test_verify(self):
+        service = self.make_service()
+        encoded = old_hash('secret')
+
+        async def verify():
+            task = asyncio.ensure_future(service.averify('secret', encoded))
+            await asyncio.sleep(0)
+            service.executor.finish()
+            return await task
+
+        is_correct, rehashed = asyncio.run(verify())
+        self.assertTrue(is_correct)
+        self.assertNotEqual(rehashed, encoded)
+        self.assertTrue(check_password('secret', rehashed))
+
+
+class RehashTestCase(TransactionTestCase):
+    """Passwords hashed with other settings are upgraded on login."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@example.com',
+            password='secret',
+            name='User'
+        )
+        User.objects.filter(pk=self.user.pk).update(
+            password=old_hash('secret')
+        )
+        self.user.refresh_from_db()
+
+    def assertRehashed(self):
+        self.user.refresh_from_db()
+        hasher = PBKDF2PasswordHasher()
+        iterations = hasher.decode(self.user.password)['iterations']
+        self.assertEqual(iterations, hasher.iterations)
+        self.assertTrue(self.user.check_password('secret'))
+
+    def test_check_user_password(self):
+        self.assertTrue(passwords.check_user_password(self.user, 'secret'))
+        self.assertRehashed()
+
+    def test_acheck_user_password(self):
+        threads = []
+        save = passwords._save_rehashed
+
+        def save_rehashed(user, encoded):
+            threads.append(threading.current_thread().name)
+            save(user, encoded)
+
+        with mock.patch.object(
+            passwords, '_save_rehashed', side_effect=save_rehashed
+        ):
+            self.assertTrue(asyncio.run(
+                passwords.acheck_user_password(self.user, 'secret')
+            ))
+        self.assertRehashed()
+        # Saved by the bounded pool of the async database work.
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith('async-db'))
+
+    def test_wrong_password(self):
+        encoded = self.user.password
+        self.assertFalse(passwords.check_user_password(self.user, 'wrong'))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.password, encoded)
+
+
+@override_settings(ROOT_URLCONF='app.asgi_urls')
+class AsgiTestCase(TransactionTestCase):
+    """The endpoints answer through the ASGI handler."""
+
+    def setUp(self):
+        user_cache.clear()
+        invalidate_users(None)
+        self.user = User.objects.create_user(
+            email='staff@example.com',
+            password='secret',
+            name='Staff',
+            is_staff=True,
+            is_superuser=True
+        )
+
+    def call(self, method, path, headers=None, body=b''):
+        return asyncio.run(
+            call_asgi(ASGIHandler(), method, path, headers, body)
+        )
+
+    def login(self):
+        return self.call(
+            'POST', '/api/auth', {'Content-Type': 'application/json'},
+            json.dumps({'email': self.user.email, 'password': 'secret'})
+            .encode()
+        )
+
+    @override_settings(JWT_EMBED_CLAIMS=True)
+    def test_login_with_embedded_claims(self):
+        status_code, body = self.login()
+        self.assertEqual(status_code, 200)
+        token = json.loads(body)['token']
+        self.assertIn('pv', jwt.decode(token, verify=False))
+
+    def test_import_is_wsgi_only(self):
+        token = json.loads(self.login()[1])['token']
+        status_code, body = self.call(
+            'POST', '/api/users/import',
+            {'Authorization': 'Bearer ' + token,
+             'Content-Type': 'application/jsonl'},
+            b'{"email": "new@example.com", "name": "New"}\n'
+        )
+        self.assertEqual(status_code, 404)
+        self.assertFalse(User.objects.filter(email='new@example.com'))
+
+    def test_export_is_wsgi_only(self):
+        headers = {
+            'Authorization': 'Bearer ' + json.loads(self.login()[1])['token']
+        }
+        status_code, body = self.call('GET', '/api/users/export', headers)
+        self.assertEqual(status_code, 404)
+
+        status_code, body = self.call(
+            'GET', '/api/users/export/changes', headers
+        )
+        self.assertEqual(status_code, 200)
@@ -0,0 +1,201 @@
+"""Async views serving the user endpoints in the ASGI deployment.
+
+They answer like their `users.api` viewsets, throttled the same way, but
+only hop to a thread for the database work (see `utils.concurrency`) and
+check passwords in the password process pool.
+"""
+import json
+
+from django.conf import settings
+from django.http import HttpResponseNotModified, JsonResponse
+from django.utils.cache import patch_vary_headers
+
+from rest_framework import exceptions, status
+from rest_framework.serializers import ValidationError, as_serializer_error
+from rest_framework.utils.encoders import JSONEncoder
+
+from users.api import AuthViewSet, CreateUserViewSet
+from users.passwords import acheck_user_password
+from users.profile import get_profile, is_fresh
+from users.serializers import (
+    AuthResponseSerializer, AuthSerializer, CreateUserSerializer
+)
+
+from utils.authentication import JSONWebTokenAuthentication
+from utils.concurrency import database_sync_to_async
+from utils.throttling import throttle_wait
+
+
+def api_response(data=None, status=status.HTTP_200_OK, headers=None):
+    """Return `data` rendered as the API renders it."""
+    response = JsonResponse(
+        data,
+        encoder=JSONEncoder,
+        status=status,
+        safe=False,
+        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')}
+    )
+    for name, value in (headers or {}).items():
+        response[name] = value
+    return response
+
+
+def method_not_allowed(request, allowed):
+    """Return the 405 response of a request to a view."""
+    return api_response(
+        {'detail': 'Method "{0}" not allowed.'.format(request.method)},
+        status=status.HTTP_405_METHOD_NOT_ALLOWED,
+        headers={'Allow': ', '.join(allowed)}
+    )
+
+
+def exception_response(exc):
+    """Return the response of an API exception, as DRF's handler does."""
+    headers = {}
+    if getattr(exc, 'wait', None):
+        headers['Retry-After'] = '%d' % exc.wait
+    return api_response(
+        {'detail': exc.detail}, status=exc.status_code, headers=headers
+    )
+
+
+def check_throttles(view, request, data):
+    """Raise `Throttled` if the throttles of `view` refuse the request."""
+    wait = throttle_wait(view, request, data)
+    if wait:
+        raise exceptions.Throttled(wait)
+
+
+def parse_body(request):
+    """Return the JSON or form data of the request."""
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError as e:
+            raise exceptions.ParseError(
+                'JSON parse error - {0}'.format(e)
+            )
+    return request.POST
+
+
+def _login_data(user):
+    return AuthResponseSerializer(user).data
+
+
+async def login(request):
+    """Async version of `AuthViewSet.create`."""
+    if request.method != 'POST':
+        return method_not_allowed(request, ['POST', 'OPTIONS'])
+
+    serializer = AuthSerializer()
+    try:
+        body = parse_body(request)
+        check_throttles(AuthViewSet, request, body)
+        data = serializer.to_internal_value(body)
+        user = await database_sync_to_async(serializer.get_user)(
+            data['email']
+        )
+        serializer.check_user(
+            user,
+            await acheck_user_password(user, data['password'])
+        )
+    except ValidationError as e:
+        return api_response(
+            as_serializer_error(e),
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except exceptions.APIException as e:
+        return exception_response(e)
+
+    if settings.JWT_EMBED_CLAIMS:
+        # The permission version signed into the token reads the database
+        # unless it is cached.
+        data = await database_sync_to_async(_login_data)(user)
+    else:
+        data = _login_data(user)
+    return api_response(data)
+
+
+async def profile(request):
+    """Async version of `ProfileViewSet.retrieve`."""
+    if request.method not in ('GET', 'HEAD'):
+        return method_not_allowed(request, ['GET', 'HEAD', 'OPTIONS'])
+
+    www_authenticate = JSONWebTokenAuthentication().authenticate_header(
+        request
+    )
+    try:
+        user = await request.auser()
+    except exceptions.AuthenticationFailed as e:
+        return api_response(
+            {'detail': e.detail},
+            status=e.status_code,
+            headers={'WWW-Authenticate': www_authenticate}
+        )
+
+    if not user.is_authenticated:
+        return api_response(
+            {'detail': exceptions.NotAuthenticated.default_detail},
+            status=status.HTTP_401_UNAUTHORIZED,
+            headers={'WWW-Authenticate': www_authenticate}
+        )
+
+    # The shared cache may be on the network, so it is read in a thread.
+    etag, data = await database_sync_to_async(get_profile)(user)
+
+    if is_fresh(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = api_response(data)
+
+    response['ETag'] = etag
+    patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+def _create_user(serializer):
+    if not serializer.is_valid():
+        return None
+
+    data = serializer.data
+    serializer.create(serializer.validated_data)
+    return data
+
+
+async def create_user(request):
+    """Async version of `CreateUserViewSet.create`."""
+    if request.method != 'POST':
+        return method_not_allowed(request, ['POST', 'OPTIONS'])
+
+    try:
+        body = parse_body(request)
+        check_throttles(CreateUserViewSet, request, body)
+    except exceptions.APIException as e:
+        return exception_response(e)
+
+    serializer = CreateUserSerializer(data=body)
+
+    data = await database_sync_to_async(_create_user)(serializer)
+    if data is None:
+        return api_response(
+            serializer.errors,
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return api_response(data, status=status.HTTP_201_CREATED)
+
+
+async def wsgi_only(request):
+    """Answer the streaming endpoints, which only the WSGI deployment
+    serves: Django iterates a streaming response on the event loop, so
+    their queries would run there."""
+    return api_response(
+        {'detail': 'Only served by the WSGI deployment.'},
+        status=status.HTTP_404_NOT_FOUND
+    )
+
+
+# Authentication is done by tokens, never by session cookies.
+login.csrf_exempt = True
+profile.csrf_exempt = True
+create_user.csrf_exempt = True
+wsgi_only.csrf_exempt = True
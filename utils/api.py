@@ -0,0 +1,25 @@
+"""Utils API."""
+from rest_framework import viewsets
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from utils.metrics import render_metrics
+from utils.mixins import BaseGenericViewSet
+from utils.renderers import PrometheusRenderer
+
+
+class MetricsViewSet(viewsets.GenericViewSet,
+                     BaseGenericViewSet):
+    """Per route request metrics, for staff only."""
+
+    permission_classes = [IsAdminUser]
+    renderer_classes = [PrometheusRenderer]
+
+    query_budgets = {'list': 1}
+
+    def list(self, request):
+        """Return the metrics of every worker process."""
+        return Response(
+            render_metrics(),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class UtilsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'utils'
+
+    def ready(self):
+        """Bury the deleted rows of the models using `TimeStampedMixin`."""
+        from django.db.models.signals import post_delete
+
+        from utils.models import TimeStampedMixin
+        from utils.signals import bury
+
+        for model in self.apps.get_models():
+            if issubclass(model, TimeStampedMixin):
+                post_delete.connect(bury, sender=model)
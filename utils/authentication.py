@@ -1,8 +1,7 @@
 """Provides various authentication policies."""
+from django.conf import settings
 from django.utils.encoding import smart_text
 
-import jwt
-
 from rest_framework import exceptions
 from rest_framework.authentication import (
     BaseAuthentication, get_authorization_header
@@ -10,8 +9,48 @@ from rest_framework.authentication import (
 
 from rest_framework_jwt.settings import api_settings
 
+from users.backends import permission_version, version_cache
 from users.models import User
 
+from utils.cache import LRUCache
+from utils.principals import TokenUser
+from utils.tokens import jwt_decode_handler
+
+# Attribute of the `HttpRequest` holding its authentication result.
+REQUEST_RESULT_ATTR = '_jwt_authentication'
+
+_MISSING = object()
+
+# Verified token -> user snapshot, shared by every request of the process.
+user_cache = LRUCache(
+    max_size=settings.JWT_USER_CACHE_SIZE,
+    ttl=settings.JWT_USER_CACHE_TTL
+)
+
+
+def snapshot_user(user):
+    """Return the values needed to rebuild `user` without a query."""
+    fields = User._meta.concrete_fields
+    return user._state.db, tuple(getattr(user, f.attname) for f in fields)
+
+
+def restore_user(snapshot):
+    """Build a fresh `User` instance from a snapshot."""
+    db, values = snapshot
+    field_names = [f.attname for f in User._meta.concrete_fields]
+    return User.from_db(db, field_names, values)
+
+
+def get_principal(payload):
+    """
+    Return a `TokenUser` for a payload with embedded claims whose permission
+    version is still current, otherwise `None`.
+    """
+    version = payload.get('pv')
+    if version is None or version != version_cache.get(payload['user_id']):
+        return None
+    return TokenUser.from_payload(payload)
+
 
 #
 # JWT AUTHENTICATION
@@ -25,7 +64,26 @@ class BaseJSONWebTokenAuthentication(BaseAuthentication):
         """
         Returns a two-tuple of `User` and token if a valid signature has been
         supplied using JWT-based authentication.  Otherwise returns `None`.
+
+        The outcome is stored on the underlying `HttpRequest`, so the
+        middleware and the DRF views of the same request share a single
+        header parse, token decode and user lookup.
         """
+        http_request = getattr(request, '_request', request)
+        result = getattr(http_request, REQUEST_RESULT_ATTR, _MISSING)
+
+        if result is _MISSING:
+            try:
+                result = self._authenticate(request)
+            except exceptions.AuthenticationFailed as e:
+                result = e
+            setattr(http_request, REQUEST_RESULT_ATTR, result)
+
+        if isinstance(result, exceptions.AuthenticationFailed):
+            raise result
+        return result
+
+    def _authenticate(self, request):
         jwt_value = self.get_jwt_value(request)
         if jwt_value is None:
             return None
@@ -37,16 +95,51 @@ class BaseJSONWebTokenAuthentication(BaseAuthentication):
     def authenticate_credentials(self, token):
         """
         Returns an active user that matches the payload's user id and email.
+
+        Users are served from `user_cache` once their token has been
+        verified, so only the first request of a token hits the database.
+        With `JWT_EMBED_CLAIMS`, tokens whose permission version is current
+        get a `TokenUser` built from their claims instead.
         """
+        payload = None
+        if settings.JWT_EMBED_CLAIMS:
+            payload = self.decode(token)
+            principal = get_principal(payload)
+            if principal is not None:
+                return principal
+
+        user = self.get_user(token, payload)
+        if payload is not None and 'pv' in payload:
+            # Refresh the current version, so later requests carrying the
+            # token may skip the database again.
+            permission_version(user)
+        return user
+
+    def get_user(self, token, payload=None):
+        """Return the user of the token from `user_cache` or the database."""
+        snapshot = user_cache.get(token)
+        if snapshot is not None:
+            return restore_user(snapshot)
+
+        epoch = user_cache.epoch
         try:
-            unverified_payload = jwt.decode(token, None, False)
-            user = User.objects.get(email=unverified_payload['email'])
+            if payload is None:
+                payload = jwt_decode_handler(token)
+            user = User.objects.get_by_email(payload['email'])
         except Exception as e:
             print(e)
             raise exceptions.AuthenticationFailed('Invalid signature.')
 
+        user_cache.set(token, snapshot_user(user), tag=user.pk, epoch=epoch)
         return user
 
+    def decode(self, token):
+        """Return the verified payload of the token."""
+        try:
+            return jwt_decode_handler(token)
+        except Exception:
+            raise exceptions.AuthenticationFailed('Invalid signature.')
+
 
 class JSONWebTokenAuthentication(BaseJSONWebTokenAuthentication):
     """
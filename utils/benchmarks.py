@@ -0,0 +1,208 @@
+"""Helpers shared by the benchmark management commands."""
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from io import BytesIO
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_databases,
+    teardown_databases
+)
+
+
+@contextmanager
+def benchmark_database(verbosity=0, keepdb=False):
+    """Run the block against throwaway test databases."""
+    old_config = setup_databases(verbosity, interactive=False, keepdb=keepdb)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity, keepdb=keepdb)
+
+
+def without_throttling():
+    """
+    Turn the throttles off for the block, the benchmarks sending far more
+    requests of a client than they allow.
+    """
+    return override_settings(REST_FRAMEWORK=dict(
+        settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES={}
+    ))
+
+
+def percentile(samples, pct):
+    """Return the `pct` percentile of the sorted `samples`."""
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, int(round(pct / 100.0 * len(samples))))
+    return samples[index]
+
+
+def summarize(samples):
+    """Return count, mean and percentiles (in ms) of timings in seconds."""
+    samples = sorted(samples)
+    count = len(samples)
+    return {
+        'count': count,
+        'mean_ms': sum(samples) / count * 1000 if count else 0.0,
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p95_ms': percentile(samples, 95) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000,
+    }
+
+
+def measure(func, number=1000, setup=None):
+    """
+    Call `func` `number` times and return the per call timings in seconds
+    and the mean number of queries run per call.
+
+    `setup` is called before each call, outside the measurement, and
+    returns the arguments to pass to `func`.
+    """
+    samples = []
+    query_count = 0
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(number):
+            args = setup() if setup is not None else ()
+            before = len(queries)
+            start = time.perf_counter()
+            func(*args)
+            samples.append(time.perf_counter() - start)
+            query_count += len(queries) - before
+    return samples, query_count / float(number)
+
+
+def run_threads(send, concurrency, total):
+    """
+    Call `send(index)` for indexes 0 to `total` from `concurrency` threads,
+    and return the timings in seconds, the error statuses and the elapsed
+    time. `send` returns a response status.
+    """
+    samples, errors = [], []
+    indexes = iter(range(total))
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                index = next(indexes, None)
+            if index is None:
+                return
+            start = time.perf_counter()
+            status = send(index)
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples.append(elapsed)
+                if status >= 400:
+                    errors.append(status)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, errors, time.perf_counter() - start
+
+
+def _header_name(name):
+    return name.upper().replace('-', '_')
+
+
+def call_wsgi(application, method, path, headers=None, body=b''):
+    """Send a request to a WSGI application, return (status, body)."""
+    path, _, query_string = path.partition('?')
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': query_string,
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in (headers or {}).items():
+        key = _header_name(name)
+        if key != 'CONTENT_TYPE':
+            key = 'HTTP_' + key
+        environ[key] = value
+
+    status = []
+
+    def start_response(status_line, response_headers, exc_info=None):
+        status.append(int(status_line.split(' ', 1)[0]))
+
+    response = application(environ, start_response)
+    try:
+        content = b''.join(response)
+    finally:
+        if hasattr(response, 'close'):
+            response.close()
+    return status[0], content
+
+
+def call_http(base_url, method, path, headers=None, body=b''):
+    """Send a request to a running server, return (status, body)."""
+    request = Request(
+        base_url.rstrip('/') + path,
+        data=body or None,
+        headers=headers or {},
+        method=method
+    )
+    try:
+        with urlopen(request) as response:
+            return response.status, response.read()
+    except HTTPError as e:
+        return e.code, e.read()
+
+
+async def call_asgi(application, method, path, headers=None, body=b''):
+    """Send a request to an ASGI application, return (status, body)."""
+    path, _, query_string = path.partition('?')
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query_string.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'localhost')] + [
+            (name.lower().encode(), value.encode())
+            for name, value in (headers or {}).items()
+        ],
+        'client': ('127.0.0.1', 0),
+        'server': ('localhost', 80),
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    status = []
+    chunks = []
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+        elif message['type'] == 'http.response.body':
+            chunks.append(message.get('body', b''))
+
+    await application(scope, receive, send)
+    return status[0], b''.join(chunks)
@@ -0,0 +1,102 @@
+"""In-process caches."""
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    Thread-safe mapping bounded by `max_size` entries, with least recently
+    used eviction and a time to live per entry.
+
+    Entries may be stored under a `tag` (for example the primary key of the
+    object they were built from) so that everything derived from the same
+    object can be invalidated at once.
+    """
+
+    def __init__(self, max_size=1024, ttl=60, timer=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self.epoch = 0
+        self._data = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """Return the live value stored under `key` or `default`."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires, _, value = entry
+                if expires > self.timer():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+            self.misses += 1
+            return default
+
+    def set(self, key, value, tag=None, epoch=None):
+        """
+        Store `value` under `key`.
+
+        When `epoch` is given the value is discarded if any invalidation
+        happened since that epoch was read, which keeps values loaded
+        concurrently with a write from outliving the invalidation.
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if epoch is not None and epoch != self.epoch:
+                return
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (self.timer() + self.ttl, tag, value)
+            if tag is not None:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._data) > self.max_size:
+                self._remove(next(iter(self._data)))
+
+    def delete(self, key):
+        """Drop the entry stored under `key`."""
+        with self._lock:
+            self.epoch += 1
+            if key in self._data:
+                self._remove(key)
+
+    def invalidate(self, tag):
+        """Drop every entry stored with the given `tag`."""
+        with self._lock:
+            self.epoch += 1
+            for key in tuple(self._tags.get(tag, ())):
+                self._remove(key)
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self.epoch += 1
+            self._data.clear()
+            self._tags.clear()
+
+    def stats(self):
+        """Return the counters of the cache."""
+        return {
+            'size': len(self._data),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def _remove(self, key):
+        _, tag, _ = self._data.pop(key)
+        if tag is not None:
+            keys = self._tags[tag]
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
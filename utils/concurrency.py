@@ -0,0 +1,39 @@
+"""Run blocking database code from coroutines."""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+# Threads allowed to hold a database connection for async views.
+db_executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_DB_THREADS,
+    thread_name_prefix='async-db'
+)
+
+
+def _run_in_db_thread(func, args, kwargs):
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+def database_sync_to_async(func):
+    """
+    Turn the blocking `func` into a coroutine function that runs it in
+    `db_executor`, closing the connections of the thread that are past
+    their lifetime the same way a request does. The context variables of
+    the caller are visible to `func`.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            db_executor, context.run, _run_in_db_thread, func, args, kwargs
+        )
+    return wrapper
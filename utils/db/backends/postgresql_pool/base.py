@@ -0,0 +1,37 @@
+"""
+PostgreSQL backend sharing a pool of connections between the threads of
+each process.
+
+Closing a connection, as Django does at the end of every request, gives it
+back to the pool instead. Configure the pool with a POOL dict in the
+database settings, see `pools.POOL_DEFAULTS`.
+"""
+from django.db.backends.postgresql import base
+
+from utils.db.backends.postgresql_pool.creation import DatabaseCreation
+from utils.db.backends.postgresql_pool.pools import get_pool
+from utils.db.pool import PoolTimeout
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    _pool = None
+
+    def get_new_connection(self, conn_params):
+        pool = get_pool(self.alias, self.settings_dict, conn_params)
+        try:
+            connection = pool.acquire()
+        except PoolTimeout as e:
+            raise base.Database.OperationalError(str(e)) from e
+
+        self._pool = pool
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self._pool.release(self.connection)
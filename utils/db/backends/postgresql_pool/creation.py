@@ -0,0 +1,13 @@
+from django.db.backends.postgresql import creation
+
+from utils.db.backends.postgresql_pool import pools
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Pooled connections to the test database would block DROP DATABASE.
+        pools.close_pools(self.connection.alias)
+        super(DatabaseCreation, self)._destroy_test_db(
+            test_database_name, verbosity
+        )
@@ -0,0 +1,160 @@
+"""The connection pools of the process, one per database settings."""
+import os
+import threading
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+
+from utils.db.pool import ConnectionPool
+from utils.metrics import register_collector
+
+# Pool settings, from the POOL dict of the database settings.
+POOL_DEFAULTS = {
+    'MIN_SIZE': 0,
+    'MAX_SIZE': 10,
+    'TIMEOUT': 10,
+    'CHECK_IDLE': 5,
+    'MAX_IDLE': 300,
+}
+
+_pools = {}
+_pools_pid = None
+_pools_lock = threading.Lock()
+# Pools inherited through fork, kept referenced so that garbage collecting
+# them never closes the connections of the parent process.
+_inherited_pools = []
+
+
+def connect(conn_params, isolation_level):
+    """Open a psycopg2 connection as the postgresql backend does."""
+    connection = psycopg2.connect(**conn_params)
+    if (isolation_level is not None
+            and isolation_level != connection.isolation_level):
+        connection.set_session(isolation_level=isolation_level)
+    psycopg2.extras.register_default_jsonb(
+        conn_or_curs=connection, loads=lambda x: x
+    )
+    return connection
+
+
+def close(connection):
+    connection.close()
+
+
+def is_alive(connection):
+    """Check a connection with a round trip to the server."""
+    if connection.closed:
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        if not connection.autocommit:
+            connection.rollback()
+    except psycopg2.Error:
+        return False
+    return True
+
+
+def reset(connection):
+    """Roll back what the last user left open, tell if it is reusable."""
+    if connection.closed:
+        return False
+    try:
+        status = connection.get_transaction_status()
+        if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            connection.rollback()
+    except psycopg2.Error:
+        return False
+    return True
+
+
+def get_pool(alias, settings_dict, conn_params):
+    """Return the pool of the given connection parameters."""
+    global _pools_pid
+    key = (alias, tuple(sorted(
+        (name, str(value)) for name, value in conn_params.items()
+    )))
+    pid = os.getpid()
+    with _pools_lock:
+        if _pools_pid != pid:
+            _inherited_pools.extend(_pools.values())
+            _pools.clear()
+            _pools_pid = pid
+
+        pool = _pools.get(key)
+        if pool is None:
+            options = dict(POOL_DEFAULTS, **settings_dict.get('POOL', {}))
+            isolation_level = settings_dict['OPTIONS'].get('isolation_level')
+            pool = ConnectionPool(
+                connect=lambda: connect(conn_params, isolation_level),
+                close=close,
+                check=is_alive,
+                reset=reset,
+                min_size=int(options['MIN_SIZE']),
+                max_size=int(options['MAX_SIZE']),
+                timeout=float(options['TIMEOUT']),
+                check_idle=float(options['CHECK_IDLE']),
+                max_idle=float(options['MAX_IDLE'])
+            )
+            pool.alias = alias
+            _pools[key] = pool
+            created = True
+        else:
+            created = False
+
+    if created:
+        pool.fill()
+    return pool
+
+
+def close_pools(alias=None):
+    """Close the pools of `alias`, or every pool."""
+    with _pools_lock:
+        keys = [key for key in _pools if alias is None or key[0] == alias]
+        closed = [_pools.pop(key) for key in keys]
+    for pool in closed:
+        pool.close()
+
+
+def pool_stats():
+    """Return the stats of every pool of the process."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [(pool.alias, pool.stats()) for pool in pools]
+
+
+@register_collector
+def pool_metrics():
+    """Stats of the pools of the process serving the metrics request."""
+    stats = pool_stats()
+    gauges = (
+        ('db_pool_connections', 'Open pooled connections.', 'gauge', [
+            ({'alias': alias, 'state': state}, values[state])
+            for alias, values in stats for state in ('idle', 'in_use')
+        ]),
+    )
+    metrics = [
+        ('db_pool_waiting', 'Threads waiting for a connection.', 'gauge',
+         'waiting'),
+        ('db_pool_max_size', 'Maximum size of the pool.', 'gauge',
+         'max_size'),
+        ('db_pool_checkouts_total', 'Connections handed out.', 'counter',
+         'checkouts'),
+        ('db_pool_timeouts_total', 'Checkouts that timed out.', 'counter',
+         'timeouts'),
+        ('db_pool_connects_total', 'Connections opened.', 'counter',
+         'connects'),
+        ('db_pool_discarded_total', 'Broken connections dropped.',
+         'counter', 'discarded'),
+        ('db_pool_wait_seconds_total', 'Time spent waiting for a '
+         'connection.', 'counter', 'wait_time'),
+    ]
+    return gauges + tuple(
+        (name, help, kind, [
+            ({'alias': alias}, values[key]) for alias, values in stats
+        ])
+        for name, help, kind, key in metrics
+    )
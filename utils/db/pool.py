@@ -0,0 +1,170 @@
+"""Thread safe pool of database connections."""
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """No connection was released before the checkout timeout."""
+
+
+class ConnectionPool(object):
+    """
+    Pool of up to `max_size` connections made by `connect()`.
+
+    `acquire()` hands out the most recently released connection, or opens
+    a new one below `max_size`, or waits up to `timeout` seconds for one to
+    be released. Connections idle for `check_idle` seconds or more are
+    checked with `check(connection)` before being handed out, and those idle
+    for `max_idle` seconds are closed, down to `min_size` connections.
+    `reset(connection)` cleans a released connection up and tells whether
+    it can be reused.
+    """
+
+    def __init__(self, connect, close, check=None, reset=None, min_size=0,
+                 max_size=10, timeout=10.0, check_idle=5.0, max_idle=300.0,
+                 timer=time.monotonic):
+        self._connect = connect
+        self._close = close
+        self._check = check
+        self._reset = reset
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_idle = check_idle
+        self.max_idle = max_idle
+        self._timer = timer
+
+        self._condition = threading.Condition(threading.Lock())
+        # (connection, released at), the most recently released last.
+        self._idle = deque()
+        self._size = 0
+        self._waiting = 0
+        self._closed = False
+
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.discarded = 0
+        self.wait_time = 0.0
+
+    def fill(self):
+        """Open connections up to `min_size`."""
+        while True:
+            with self._condition:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            connection = self._open()
+            self.release(connection)
+
+    def _open(self):
+        try:
+            connection = self._connect()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self.connects += 1
+        return connection
+
+    def _discard(self, connections):
+        for connection in connections:
+            try:
+                self._close(connection)
+            except Exception:
+                pass
+
+    def acquire(self):
+        """Return a connection, raise PoolTimeout if none is available."""
+        deadline = self._timer() + self.timeout
+        while True:
+            connection = None
+            with self._condition:
+                while True:
+                    if self._idle:
+                        connection, released_at = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+
+                    remaining = deadline - self._timer()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeout(
+                            'No database connection available after '
+                            '{0} seconds ({1} in use).'.format(
+                                self.timeout, self._size
+                            )
+                        )
+                    self._waiting += 1
+                    start = self._timer()
+                    self._condition.wait(remaining)
+                    self.wait_time += self._timer() - start
+                    self._waiting -= 1
+
+            if connection is None:
+                connection = self._open()
+            elif (self._check is not None
+                    and self._timer() - released_at >= self.check_idle
+                    and not self._check(connection)):
+                with self._condition:
+                    self._size -= 1
+                    self.discarded += 1
+                    self._condition.notify()
+                self._discard([connection])
+                continue
+
+            with self._condition:
+                self.checkouts += 1
+            return connection
+
+    def release(self, connection):
+        """Give a connection back to the pool."""
+        reusable = self._reset is None or self._reset(connection)
+        expired = []
+        with self._condition:
+            if not reusable or self._closed:
+                self._size -= 1
+                if not reusable:
+                    self.discarded += 1
+                expired.append(connection)
+            else:
+                now = self._timer()
+                self._idle.append((connection, now))
+                while (self._size > self.min_size and self._idle
+                        and now - self._idle[0][1] >= self.max_idle):
+                    expired.append(self._idle.popleft()[0])
+                    self._size -= 1
+            self._condition.notify()
+        self._discard(expired)
+
+    def close(self):
+        """Close the idle connections, and the others once released."""
+        with self._condition:
+            self._closed = True
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._condition.notify_all()
+        self._discard(idle)
+
+    def stats(self):
+        """Return the current state and the counters of the pool."""
+        with self._condition:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'waiting': self._waiting,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'connects': self.connects,
+                'discarded': self.discarded,
+                'wait_time': self.wait_time,
+            }
@@ -0,0 +1,184 @@
+"""Database routers."""
+import contextvars
+import itertools
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError, connections
+
+from rest_framework.exceptions import AuthenticationFailed
+
+PRIMARY = 'default'
+
+
+class RoutingState(object):
+    """Who the request is for, and whether its reads are on the primary."""
+
+    __slots__ = ('keys', 'pinned')
+
+    def __init__(self, keys, pinned=False):
+        self.keys = keys
+        self.pinned = pinned
+
+
+routing_state = contextvars.ContextVar('routing_state', default=None)
+
+
+def sticky_cache():
+    """
+    Return the cache of the users and clients that wrote recently, whose
+    reads stay on the primary until the replicas have caught up. It must be
+    shared by every server process for the reads to stay there.
+    """
+    return caches[settings.REPLICA_STICKY_CACHE]
+
+
+def user_key(pk):
+    return 'sticky:user:{0}'.format(pk)
+
+
+def request_keys(request):
+    """
+    Return the stickiness keys of a request: its user, as authenticated by
+    `utils.middlewares.AuthenticationMiddlewareJWT`, or its session, or else
+    its client address.
+    """
+    keys = []
+    try:
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            keys.append(user_key(user.pk))
+    except AuthenticationFailed:
+        pass
+
+    session = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if session:
+        keys.append('sticky:session:{0}'.format(session))
+
+    if not keys:
+        keys.append(
+            'sticky:client:{0}'.format(request.META.get('REMOTE_ADDR'))
+        )
+    return keys
+
+
+def is_pinned(keys):
+    """Tell whether one of `keys` wrote recently."""
+    return bool(sticky_cache().get_many(keys))
+
+
+def begin_request(keys, pinned=None):
+    """
+    Start routing a request, return the token for `end_request()`. Pass
+    `pinned` when already known from `is_pinned(keys)`.
+    """
+    if pinned is None:
+        pinned = is_pinned(keys)
+    return routing_state.set(RoutingState(keys, pinned))
+
+
+def end_request(token):
+    routing_state.reset(token)
+
+
+def pin(keys):
+    """Send the reads of `keys` to the primary for a while."""
+    if keys:
+        sticky_cache().set_many(
+            dict.fromkeys(keys, True), timeout=settings.REPLICA_STICKY_SECONDS
+        )
+
+
+class ReplicaHealth(object):
+    """
+    Health of the replicas, checked with a query at most every `interval`
+    seconds. While one thread checks, the others use the last result.
+    """
+
+    def __init__(self, interval, timer=time.monotonic):
+        self.interval = interval
+        self.timer = timer
+        self._checked = {}
+        self._lock = threading.Lock()
+
+    def is_healthy(self, alias):
+        entry = self._checked.get(alias)
+        if entry is not None and self.timer() - entry[0] < self.interval:
+            return entry[1]
+
+        if not self._lock.acquire(blocking=False):
+            return entry[1] if entry is not None else True
+        try:
+            healthy = self.check(alias)
+            self._checked[alias] = (self.timer(), healthy)
+        finally:
+            self._lock.release()
+        return healthy
+
+    def check(self, alias):
+        connection = connections[alias]
+        try:
+            connection.ensure_connection()
+            healthy = connection.is_usable()
+        except DatabaseError:
+            healthy = False
+        if not healthy:
+            connection.close()
+        return healthy
+
+
+class ReplicaRouter(object):
+    """
+    Send the reads done while serving a request to the healthy replicas of
+    `DATABASE_REPLICAS` in turn, and everything else to the primary.
+
+    Reads go to the primary inside transactions, after the request wrote,
+    and for `REPLICA_STICKY_SECONDS` after a write of the same user (or
+    session, or anonymous client) so that they never see stale data.
+    """
+
+    def __init__(self):
+        self.replicas = list(settings.DATABASE_REPLICAS)
+        self.health = ReplicaHealth(settings.REPLICA_HEALTH_INTERVAL)
+        self._turn = itertools.count()
+
+    def db_for_read(self, model, **hints):
+        state = routing_state.get()
+        if (state is None or state.pinned or not self.replicas
+                or connections[PRIMARY].in_atomic_block):
+            return PRIMARY
+
+        start = next(self._turn)
+        for offset in range(len(self.replicas)):
+            alias = self.replicas[(start + offset) % len(self.replicas)]
+            if self.health.is_healthy(alias):
+                return alias
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        keys = []
+        state = routing_state.get()
+        if state is not None:
+            state.pinned = True
+            keys.extend(state.keys)
+
+        instance = hints.get('instance')
+        if (instance is not None and instance.pk is not None
+                and instance._meta.label == settings.AUTH_USER_MODEL):
+            keys.append(user_key(instance.pk))
+
+        pin(keys)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *self.replicas}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in self.replicas:
+            return False
+        return None
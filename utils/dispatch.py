@@ -0,0 +1,176 @@
+"""URL dispatch for the router generated patterns."""
+import re
+import threading
+
+from django.urls import Resolver404, URLPattern, URLResolver
+from django.urls.resolvers import RegexPattern, ResolverMatch
+
+# Characters that make a path segment a regex rather than a literal.
+REGEX_CHARS = frozenset('.^$*+?{}[]\\|()')
+
+
+def split_segments(regex):
+    """
+    Split an anchored route regex in its path segments, or return `None` if
+    the regex can't be split (a slash inside a group or a quantified group).
+    """
+    if not regex.startswith('^'):
+        return None
+    if regex.endswith(r'\Z'):
+        regex = regex[1:-2]
+    elif regex.endswith('$') and not regex.endswith(r'\$'):
+        regex = regex[1:-1]
+    else:
+        return None
+
+    segments, current = [], []
+    depth = 0
+    escaped = False
+    in_class = False
+    for char in regex:
+        if escaped:
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif in_class:
+            in_class = char != ']'
+        elif char == '[':
+            in_class = True
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == '/' and depth == 0:
+            segments.append(''.join(current))
+            current = []
+            continue
+        elif char == '/':
+            return None
+        current.append(char)
+    segments.append(''.join(current))
+    return segments
+
+
+class TrieNode(object):
+    """A path segment: literal children, regex children and its patterns."""
+
+    __slots__ = ('static', 'dynamic', 'patterns')
+
+    def __init__(self):
+        self.static = {}
+        self.dynamic = []
+        self.patterns = []
+
+    def child(self, segment):
+        if not REGEX_CHARS.intersection(segment):
+            return self.static.setdefault(segment, TrieNode())
+
+        for regex, node in self.dynamic:
+            if regex.pattern == segment:
+                return node
+        node = TrieNode()
+        self.dynamic.append((re.compile(segment), node))
+        return node
+
+    def candidates(self, segments, index=0):
+        """Yield the patterns that may match, literal segments first."""
+        if index == len(segments):
+            yield from self.patterns
+            return
+
+        segment = segments[index]
+        node = self.static.get(segment)
+        if node is not None:
+            yield from node.candidates(segments, index + 1)
+        for regex, node in self.dynamic:
+            if regex.fullmatch(segment):
+                yield from node.candidates(segments, index + 1)
+
+
+class TrieURLResolver(URLResolver):
+    """
+    Resolver that compiles its regex URL patterns into a trie of path
+    segments on first use, so a path is only matched against the patterns
+    sharing its segments instead of every pattern in turn.
+
+    Literal segments win over regex segments (`users/create` before
+    `users/<pk>`); patterns that can't be split in segments (includes,
+    `path()` routes) are tried afterwards, in order. Reversing is left to
+    `URLResolver`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(TrieURLResolver, self).__init__(*args, **kwargs)
+        self._trie = None
+        self._trie_lock = threading.Lock()
+
+    def _compile(self):
+        with self._trie_lock:
+            if self._trie is not None:
+                return
+
+            root, fallback = TrieNode(), []
+            for pattern in self.url_patterns:
+                segments = None
+                if (isinstance(pattern, URLPattern)
+                        and isinstance(pattern.pattern, RegexPattern)):
+                    segments = split_segments(pattern.pattern._regex)
+
+                if segments is None:
+                    fallback.append(pattern)
+                    continue
+
+                try:
+                    node = root
+                    for segment in segments:
+                        node = node.child(segment)
+                except re.error:
+                    # A segment quantified by the previous one, e.g. "/?".
+                    fallback.append(pattern)
+                else:
+                    node.patterns.append(pattern)
+
+            self._fallback = fallback
+            self._trie = root
+
+    def candidates(self, path):
+        if self._trie is None:
+            self._compile()
+        yield from self._trie.candidates(path.split('/'))
+        yield from self._fallback
+
+    def resolve(self, path):
+        path = str(path)
+        match = self.pattern.match(path)
+        if match:
+            new_path, args, kwargs = match
+            for pattern in self.candidates(new_path):
+                try:
+                    sub_match = pattern.resolve(new_path)
+                except Resolver404:
+                    continue
+                if sub_match:
+                    sub_match_dict = {**kwargs, **self.default_kwargs}
+                    sub_match_dict.update(sub_match.kwargs)
+                    sub_match_args = sub_match.args
+                    if not sub_match_dict:
+                        sub_match_args = args + sub_match.args
+                    current_route = (
+                        '' if isinstance(pattern, URLPattern)
+                        else str(pattern.pattern)
+                    )
+                    tried = []
+                    self._extend_tried(tried, pattern, sub_match.tried)
+                    return ResolverMatch(
+                        sub_match.func,
+                        sub_match_args,
+                        sub_match_dict,
+                        sub_match.url_name,
+                        [self.app_name] + sub_match.app_names,
+                        [self.namespace] + sub_match.namespaces,
+                        self._join_route(current_route, sub_match.route),
+                        tried,
+                    )
+
+        # Let Django scan every pattern to report what was tried.
+        return super(TrieURLResolver, self).resolve(path)
@@ -0,0 +1,80 @@
+"""Compare URL resolution by the trie resolver and Django's resolver."""
+import time
+
+from django.core.management.base import BaseCommand
+from django.urls import URLResolver
+from django.urls.resolvers import RegexPattern
+
+from rest_framework import mixins, viewsets
+from rest_framework.decorators import action
+
+from utils.benchmarks import summarize
+from utils.dispatch import TrieURLResolver
+from utils.routers import SimpleRouter
+
+
+class BenchViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin,
+                   viewsets.GenericViewSet):
+
+    @action(detail=False)
+    def do_some_stuff(self, request):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark resolving API paths with TrieURLResolver against '
+        "Django's URLResolver for a growing number of registered viewsets."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--routes', type=int, nargs='+', default=[10, 100, 1000]
+        )
+        parser.add_argument('--number', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        for count in options['routes']:
+            urls = self.make_urls(count)
+            paths = [
+                'api/resource-0',
+                'api/resource-{0}/42'.format(count - 1),
+                'api/resource-{0}/do-some-stuff'.format(count - 1),
+            ]
+            for label, resolver_class in (('URLResolver', URLResolver),
+                                          ('TrieURLResolver',
+                                           TrieURLResolver)):
+                resolver = resolver_class(RegexPattern(r'^api/'), urls)
+                stats = summarize(
+                    self.run(resolver, paths, options['number'])
+                )
+                self.stdout.write(
+                    '{0:>5} viewsets {1:<16} mean {2:8.4f} ms  '
+                    'p95 {3:8.4f} ms'.format(
+                        count, label, stats['mean_ms'], stats['p95_ms']
+                    )
+                )
+
+    def make_urls(self, count):
+        """Return the patterns of `count` viewsets registered in a router."""
+        router = SimpleRouter(trailing_slash=False)
+        for i in range(count):
+            router.register(
+                'resource-{0}'.format(i),
+                BenchViewSet,
+                basename='resource-{0}'.format(i)
+            )
+        return router.urls
+
+    def run(self, resolver, paths, number):
+        """Time `number` resolutions of each path, after a warm-up."""
+        for path in paths:
+            resolver.resolve(path)
+
+        samples = []
+        for _ in range(number):
+            for path in paths:
+                start = time.perf_counter()
+                resolver.resolve(path)
+                samples.append(time.perf_counter() - start)
+        return samples
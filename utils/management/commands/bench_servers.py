@@ -0,0 +1,99 @@
+"""Compare the WSGI and ASGI handlers at high concurrency."""
+import asyncio
+import json
+import time
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from users.models import User
+
+from utils.benchmarks import (
+    benchmark_database, call_asgi, call_wsgi, run_threads, summarize,
+    without_throttling
+)
+from utils.tokens import create_token
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive the WSGI and the ASGI handler in-process with the same '
+        'requests and report their throughput and latency.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=64)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument(
+            '--scenario', choices=['profile', 'login'], default='profile'
+        )
+
+    def handle(self, *args, **options):
+        with benchmark_database(), without_throttling():
+            request = self.make_request(options['scenario'])
+            concurrency, total = options['concurrency'], options['requests']
+
+            self.report('WSGI', *self.run_wsgi(request, concurrency, total))
+            with override_settings(ROOT_URLCONF='app.asgi_urls'):
+                self.report(
+                    'ASGI', *asyncio.run(
+                        self.run_asgi(request, concurrency, total)
+                    )
+                )
+
+    def make_request(self, scenario):
+        """Seed a user and return the (method, path, headers, body)."""
+        user = User.objects.create_user(
+            email='bench@example.com',
+            password='bench-password',
+            name='Bench'
+        )
+        if scenario == 'login':
+            body = json.dumps({
+                'email': user.email,
+                'password': 'bench-password'
+            }).encode()
+            headers = {'Content-Type': 'application/json'}
+            return 'POST', '/api/auth', headers, body
+
+        headers = {'Authorization': 'Bearer {0}'.format(create_token(user))}
+        return 'GET', '/api/me', headers, b''
+
+    def run_wsgi(self, request, concurrency, total):
+        """Send `total` requests from `concurrency` server threads."""
+        application = WSGIHandler()
+        return run_threads(
+            lambda index: call_wsgi(application, *request)[0],
+            concurrency,
+            total
+        )
+
+    async def run_asgi(self, request, concurrency, total):
+        """Send `total` requests with `concurrency` in flight."""
+        application = ASGIHandler()
+        samples, errors = [], []
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send_request():
+            async with semaphore:
+                start = time.perf_counter()
+                status, _ = await call_asgi(application, *request)
+                samples.append(time.perf_counter() - start)
+                if status >= 400:
+                    errors.append(status)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(send_request() for _ in range(total)))
+        return samples, errors, time.perf_counter() - start
+
+    def report(self, label, samples, errors, elapsed):
+        stats = summarize(samples)
+        self.stdout.write(
+            '{0}: {1:8.1f} req/s  p50 {2:7.2f} ms  p99 {3:7.2f} ms  '
+            '{4} errors'.format(
+                label, len(samples) / elapsed, stats['p50_ms'],
+                stats['p99_ms'], len(errors)
+            )
+        )
@@ -0,0 +1,251 @@
+"""Load benchmark of the login, profile and user creation endpoints."""
+import json
+import platform
+import uuid
+from contextlib import contextmanager
+
+import django
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+
+from users.models import User
+
+from utils.benchmarks import (
+    benchmark_database, call_http, call_wsgi, run_threads, summarize,
+    without_throttling
+)
+from utils.metrics import HISTOGRAM_OFFSETS, QUERIES, QUERY_BUCKETS, collect
+from utils.tokens import create_token
+
+SCENARIOS = ('login', 'profile', 'create')
+
+PASSWORD = 'bench-password'
+
+# Offsets of the query count sum and of the request count in a route slot.
+QUERIES_SUM = HISTOGRAM_OFFSETS[QUERIES] + len(QUERY_BUCKETS) + 1
+
+
+def query_totals():
+    """Return the (queries, requests) recorded by the metrics so far."""
+    queries = requests = 0.0
+    for values in collect().values():
+        queries += values[QUERIES_SUM]
+        requests += sum(values[HISTOGRAM_OFFSETS[QUERIES]:QUERIES_SUM])
+    return queries, requests
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive the login, profile and user creation endpoints at a given '
+        'concurrency, in-process against a throwaway database or against a '
+        'running server with --url, and report throughput, latency '
+        'percentiles and queries per request. Results can be written as '
+        'JSON and compared with an earlier run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario', action='append', choices=SCENARIOS,
+            help='Scenario to run, every scenario by default.'
+        )
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument(
+            '--url',
+            help=(
+                'Base URL of a running server using the same database, '
+                'with the THROTTLE_* rates set empty to turn them off.'
+            )
+        )
+        parser.add_argument('--output', help='Write the results to a file.')
+        parser.add_argument(
+            '--compare', help='Results of an earlier run to compare with.'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=10.0,
+            help='Percentage of slowdown reported as a regression.'
+        )
+        parser.add_argument('--keepdb', action='store_true')
+
+    def handle(self, *args, **options):
+        scenarios = options['scenario'] or SCENARIOS
+        results = {
+            'meta': {
+                'mode': 'http' if options['url'] else 'in-process',
+                'concurrency': options['concurrency'],
+                'requests': options['requests'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'scenarios': {},
+        }
+
+        with self.database(options):
+            user = self.seed()
+            send = self.get_sender(options['url'])
+            for scenario in scenarios:
+                make_request = getattr(self, 'make_{0}'.format(scenario))
+                results['scenarios'][scenario] = self.run(
+                    send, make_request(user), options
+                )
+
+        for scenario, result in results['scenarios'].items():
+            self.report(scenario, result)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+            regressions = self.compare(
+                baseline, results, options['threshold']
+            )
+            if regressions:
+                raise CommandError(
+                    '{0} regression(s) against {1}'.format(
+                        len(regressions), options['compare']
+                    )
+                )
+
+    @contextmanager
+    def database(self, options):
+        """
+        A throwaway database and no throttling in-process, the configured
+        server otherwise.
+        """
+        if options['url']:
+            yield
+        else:
+            with benchmark_database(keepdb=options['keepdb']):
+                with without_throttling():
+                    yield
+
+    def seed(self):
+        """Return the user to log in with, with a known password."""
+        user, _ = User.objects.get_or_create(
+            email='benchmark@example.com',
+            defaults={'name': 'Benchmark'}
+        )
+        user.set_password(PASSWORD)
+        user.is_active = True
+        user.save()
+        return user
+
+    def get_sender(self, url):
+        """Return a function sending a request, returning its status."""
+        if url:
+            return lambda request: call_http(url, *request)[0]
+
+        application = WSGIHandler()
+        return lambda request: call_wsgi(application, *request)[0]
+
+    def make_login(self, user):
+        body = json.dumps({'email': user.email, 'password': PASSWORD})
+        request = (
+            'POST', '/api/auth',
+            {'Content-Type': 'application/json'}, body.encode()
+        )
+        return lambda index: request
+
+    def make_profile(self, user):
+        headers = {'Authorization': 'Bearer {0}'.format(create_token(user))}
+        request = ('GET', '/api/me', headers, b'')
+        return lambda index: request
+
+    def make_create(self, user):
+        run = uuid.uuid4().hex[:8]
+
+        def make_request(index):
+            body = json.dumps({
+                'email': 'bench-{0}-{1}@example.com'.format(run, index),
+                'password': PASSWORD,
+                'name': 'Bench',
+                'last_name': 'User',
+                'is_staff': False,
+            })
+            return (
+                'POST', '/api/users/create',
+                {'Content-Type': 'application/json'}, body.encode()
+            )
+        return make_request
+
+    def run(self, send, make_request, options):
+        """Warm up, then send the requests of one scenario."""
+        for index in range(min(options['concurrency'], 10)):
+            send(make_request(-index - 1))
+
+        in_process = not options['url']
+        if in_process:
+            queries_before, requests_before = query_totals()
+
+        samples, errors, elapsed = run_threads(
+            lambda index: send(make_request(index)),
+            options['concurrency'],
+            options['requests']
+        )
+
+        result = summarize(samples)
+        result['errors'] = len(errors)
+        result['throughput_rps'] = len(samples) / elapsed
+        result['queries_per_request'] = None
+        if in_process:
+            queries, requests = query_totals()
+            if requests > requests_before:
+                result['queries_per_request'] = (
+                    (queries - queries_before) / (requests - requests_before)
+                )
+        return result
+
+    def report(self, scenario, result):
+        queries = result['queries_per_request']
+        self.stdout.write(
+            '{0:<8} {1:8.1f} req/s  p50 {2:7.2f} ms  p95 {3:7.2f} ms  '
+            'p99 {4:7.2f} ms  {5} queries/request  {6} errors'.format(
+                scenario, result['throughput_rps'], result['p50_ms'],
+                result['p95_ms'], result['p99_ms'],
+                'n/a' if queries is None else '{0:.1f}'.format(queries),
+                result['errors']
+            )
+        )
+
+    def compare(self, baseline, results, threshold):
+        """Report and return the metrics worse than `baseline`."""
+        regressions = []
+        for scenario, result in results['scenarios'].items():
+            previous = baseline.get('scenarios', {}).get(scenario)
+            if previous is None:
+                continue
+
+            checks = [
+                (key, result[key], previous[key], result[key] > limit)
+                for key, limit in (
+                    (key, previous[key] * (1 + threshold / 100.0))
+                    for key in ('p50_ms', 'p95_ms', 'p99_ms')
+                )
+            ]
+            checks.append((
+                'throughput_rps', result['throughput_rps'],
+                previous['throughput_rps'],
+                result['throughput_rps'] <
+                previous['throughput_rps'] * (1 - threshold / 100.0)
+            ))
+            if None not in (result['queries_per_request'],
+                            previous.get('queries_per_request')):
+                checks.append((
+                    'queries_per_request', result['queries_per_request'],
+                    previous['queries_per_request'],
+                    result['queries_per_request'] >
+                    previous['queries_per_request']
+                ))
+
+            for key, value, old, regressed in checks:
+                if regressed:
+                    regressions.append((scenario, key))
+                    self.stdout.write(self.style.ERROR(
+                        'REGRESSION {0} {1}: {2:.2f} (was {3:.2f})'.format(
+                            scenario, key, value, old
+                        )
+                    ))
+        return regressions
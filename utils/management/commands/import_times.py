@@ -0,0 +1,94 @@
+"""Report the import time of every module of the local apps."""
+import os
+import subprocess
+import sys
+from importlib import import_module
+from pkgutil import iter_modules
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Run in a fresh interpreter: time django.setup(), then the import of a
+# module on top of it, and whether setup had imported it already.
+SCRIPT = '''
+import sys
+import time
+from importlib import import_module
+
+start = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter()
+loaded = sys.argv[1] in sys.modules
+import_module(sys.argv[1])
+print(setup - start, time.perf_counter() - setup, int(loaded))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Import every module of the local apps, and app.urls, in a fresh '
+        'interpreter and report the time each import adds to django.setup().'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'modules', nargs='*',
+            help='Modules to time, by default those of LOCAL_APPS.'
+        )
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        modules = options['modules'] or self.get_modules()
+        setup_times = []
+        rows = []
+        for module in modules:
+            samples = [self.time_import(module)
+                       for _ in range(options['repeat'])]
+            setup_times.extend(setup for setup, _, _ in samples)
+            rows.append((
+                module,
+                min(elapsed for _, elapsed, _ in samples),
+                samples[0][2]
+            ))
+
+        self.stdout.write(
+            'django.setup() {0:8.1f} ms'.format(min(setup_times) * 1000)
+        )
+        for module, elapsed, loaded in sorted(rows, key=lambda row: -row[1]):
+            self.stdout.write('{0:<40} {1:8.1f} ms{2}'.format(
+                module, elapsed * 1000,
+                '  (imported by setup)' if loaded else ''
+            ))
+
+    def get_modules(self):
+        """Return app.urls and the top level modules of the local apps."""
+        modules = [settings.ROOT_URLCONF]
+        for app in settings.LOCAL_APPS:
+            package = import_module(app)
+            modules.extend(
+                '{0}.{1}'.format(app, info.name)
+                for info in iter_modules(package.__path__)
+                if not info.ispkg
+            )
+        return modules
+
+    def time_import(self, module):
+        env = dict(os.environ)
+        env['DJANGO_SETTINGS_MODULE'] = settings.SETTINGS_MODULE
+        env['PYTHONPATH'] = os.pathsep.join(
+            path for path in [os.getcwd(), env.get('PYTHONPATH')] if path
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', SCRIPT, module],
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True
+        )
+        if result.returncode:
+            raise CommandError(
+                'Importing {0} failed:\n{1}'.format(module, result.stderr)
+            )
+        setup, elapsed, loaded = result.stdout.split()[-3:]
+        return float(setup), float(elapsed), bool(int(loaded))
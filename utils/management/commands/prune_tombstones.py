@@ -0,0 +1,46 @@
+"""Delete the tombstones older than the retention window."""
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+
+from utils.models import TimeStampedMixin, Tombstone
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete the tombstones older than TOMBSTONE_RETENTION_DAYS, a batch '
+        'at a time over the index of each model. Run it daily.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        cutoff = Tombstone.retention_cutoff()
+        models = [
+            model for model in apps.get_models()
+            if issubclass(model, TimeStampedMixin)
+        ]
+        content_types = ContentType.objects.get_for_models(*models)
+
+        total = 0
+        for model, content_type in content_types.items():
+            expired = Tombstone.objects.filter(
+                content_type=content_type, deleted_date__lt=cutoff
+            ).order_by('deleted_date', 'pk')
+            deleted = 0
+            while True:
+                pks = list(expired.values_list(
+                    'pk', flat=True
+                )[:options['batch_size']])
+                if not pks:
+                    break
+                deleted += Tombstone.objects.filter(pk__in=pks).delete()[0]
+
+            if deleted:
+                self.stdout.write('{0}: {1} tombstones deleted'.format(
+                    model._meta.label, deleted
+                ))
+            total += deleted
+
+        self.stdout.write('{0} tombstones deleted'.format(total))
@@ -1,20 +1,54 @@
+import asyncio
+import time
+
+from django.conf import settings
 from django.contrib.auth.middleware import get_user
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
 from django.utils.deprecation import MiddlewareMixin
 from django.utils.functional import SimpleLazyObject
 
 from utils.authentication import JSONWebTokenAuthentication
+from utils.concurrency import database_sync_to_async
+from utils.db.routers import (
+    begin_request, end_request, is_pinned, request_keys
+)
+from utils.metrics import (
+    RequestStats, instrument, record_response, request_stats
+)
 
 
 class AuthenticationMiddlewareJWT(object):
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            # Mark the class as async-capable, but do the actual switch
+            # inside __call__ to avoid swapping out dunder methods.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
 
     def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
         request.user = SimpleLazyObject(
             lambda: self.__class__.get_jwt_user(request)
         )
         return self.get_response(request)
 
+    async def __acall__(self, request):
+        """
+        Async version of __call__. Async views must await `request.auser()`
+        as `request.user` would query the database from the event loop.
+        """
+        request.user = SimpleLazyObject(
+            lambda: self.__class__.get_jwt_user(request)
+        )
+        request.auser = lambda: self.__class__.aget_jwt_user(request)
+        return await self.get_response(request)
+
     @staticmethod
     def get_jwt_user(request):
         user = get_user(request)
@@ -23,11 +57,21 @@ class AuthenticationMiddlewareJWT(object):
 
         jwt_authentication = JSONWebTokenAuthentication()
 
-        if jwt_authentication.get_jwt_value(request):
-            user, jwt = jwt_authentication.authenticate(request)
+        result = jwt_authentication.authenticate(request)
+        if result is not None:
+            user, jwt = result
 
         return user
 
+    @classmethod
+    async def aget_jwt_user(cls, request):
+        """Coroutine version of `get_jwt_user`."""
+        if not hasattr(request, '_cached_jwt_user'):
+            request._cached_jwt_user = await database_sync_to_async(
+                cls.get_jwt_user
+            )(request)
+        return request._cached_jwt_user
+
 
 class DisableCsrfCheck(MiddlewareMixin):
     def process_request(self, req):
@@ -35,3 +79,89 @@ class DisableCsrfCheck(MiddlewareMixin):
         is_in_admin = req.path[1:].startswith('admin')
         if not is_in_admin and not getattr(req, attr, False):
             setattr(req, attr, True)
+
+
+class MetricsMiddleware(object):
+    """
+    Record the latency, queries, SQL time and response size of every
+    request under its route name, see `utils.metrics`.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        # Connections opened before this module was imported.
+        instrument(connection)
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            request_stats.reset(token)
+        record_response(request, response, stats, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_stats.reset(token)
+        record_response(request, response, stats, time.perf_counter() - start)
+        return response
+
+
+class ReplicaRoutingMiddleware(object):
+    """
+    Let `utils.db.routers.ReplicaRouter` know who the request is for, so
+    that it keeps their reads on the primary after they wrote. It goes
+    after `AuthenticationMiddlewareJWT`, whose verified user it reads.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        token = begin_request(request_keys(request))
+        try:
+            return self.get_response(request)
+        finally:
+            end_request(token)
+
+    @staticmethod
+    def get_routing(request):
+        keys = request_keys(request)
+        return keys, is_pinned(keys)
+
+    async def __acall__(self, request):
+        # Authenticating and reading the cache may block, so both run in a
+        # thread; the state is set here so the view's context carries it.
+        keys, pinned = await database_sync_to_async(self.get_routing)(
+            request
+        )
+        token = begin_request(keys, pinned)
+        try:
+            return await self.get_response(request)
+        finally:
+            end_request(token)
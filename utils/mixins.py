@@ -1,20 +1,162 @@
 """Generic mixins."""
+import hashlib
+import json
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+from datetime import timedelta
 from inspect import getmembers
 
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, ValidationError
 from rest_framework.generics import GenericAPIView
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.viewsets import ViewSetMixin
+
+from utils.models import TimeStampedMixin, Tombstone
 
 
 def _is_extra_action(attr):
     return hasattr(attr, 'mapping')
 
 
+class NotModified(Exception):
+    """The client already has the current representation."""
+
+
+class WatermarkExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = (
+        'The watermark is older than the deleted rows kept, '
+        'sync again from the start.'
+    )
+    default_code = 'watermark_expired'
+
+
+def _opaque_tag(etag):
+    return etag[2:] if etag.startswith('W/') else etag
+
+
+def is_not_modified(request, etag, last_modified):
+    """
+    Return whether the validators of the request match `etag`, or else
+    `last_modified`, with the weak comparison of GET requests.
+    """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        etags = parse_etags(if_none_match)
+        return '*' in etags or _opaque_tag(etag) in map(_opaque_tag, etags)
+
+    since = parse_http_date_safe(
+        request.META.get('HTTP_IF_MODIFIED_SINCE', '')
+    )
+    return (since is not None and last_modified is not None
+            and int(last_modified.timestamp()) <= since)
+
+
 class BaseGenericViewSet(GenericAPIView):
 
     """The GenericViewSet class does not provide any actions by default.
     But does include the base set of generic view behavior, such as
     the `get_object` and `get_queryset` methods.
+
+    The `conditional_actions` of a model using `TimeStampedMixin` answer
+    304 Not Modified when the conditional headers of the request match,
+    before any row is loaded, see `get_cache_validators()`. Only retrieve
+    by default: the validators of a list cost a scan of the rows it
+    filters on every request.
     """
 
+    conditional_get = True
+    conditional_actions = ('retrieve',)
+
+    def initial(self, request, *args, **kwargs):
+        super(BaseGenericViewSet, self).initial(request, *args, **kwargs)
+        self.cache_validators = self.get_cache_validators(request, kwargs)
+        if (self.cache_validators is not None
+                and is_not_modified(request, *self.cache_validators)):
+            raise NotModified()
+
+    def get_cache_validators(self, request, kwargs):
+        """
+        Return the (ETag, Last-Modified) of the rows the action reads, from
+        a single query of the latest `last_modified` and the row count,
+        which changes on deletions. `None` when it does not apply.
+
+        Only the changes touching `last_modified` show: not those made by
+        `QuerySet.update()`, by `save(update_fields=...)` without
+        'last_modified', to many-to-many relations, or to related rows the
+        serializer nests. Views whose output depends on those must update
+        `last_modified` along with them, or set `conditional_get = False`.
+        """
+        if (not self.conditional_get
+                or request.method not in ('GET', 'HEAD')
+                or getattr(self, 'action', None)
+                not in self.conditional_actions
+                or (self.queryset is None and type(self).get_queryset
+                    is GenericAPIView.get_queryset)):
+            return None
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if not issubclass(queryset.model, TimeStampedMixin):
+            return None
+        if self.action == 'retrieve':
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            if lookup_url_kwarg not in kwargs:
+                return None
+            queryset = queryset.filter(
+                **{self.lookup_field: kwargs[lookup_url_kwarg]}
+            )
+
+        state = queryset.aggregate(
+            last_modified=Max('last_modified'),
+            count=Count('pk')
+        )
+        if not state['count']:
+            return None
+
+        last_modified = state['last_modified']
+        key = repr((
+            last_modified and last_modified.isoformat(),
+            state['count'],
+            request.get_full_path(),
+            request.accepted_renderer.format,
+            request.user.pk,
+        ))
+        etag = 'W/"{0}"'.format(hashlib.md5(key.encode()).hexdigest())
+        return etag, last_modified
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super(BaseGenericViewSet, self).handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super(BaseGenericViewSet, self).finalize_response(
+            request, response, *args, **kwargs
+        )
+        validators = getattr(self, 'cache_validators', None)
+        if (validators is not None and response.status_code in (200, 304)
+                and not response.has_header('ETag')):
+            etag, last_modified = validators
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(
+                    last_modified.timestamp()
+                )
+            patch_vary_headers(response, ['Authorization'])
+        return response
+
     def get_serializer_class(self, action=None):
         """Return the serializer class depending on request method."""
 
@@ -35,7 +177,153 @@ class BaseGenericViewSet(GenericAPIView):
         kwargs['context'] = self.get_serializer_context()
         return serializer_class(*args, **kwargs)
 
+    def __init_subclass__(cls, **kwargs):
+        super(BaseGenericViewSet, cls).__init_subclass__(**kwargs)
+        # Viewsets list `ViewSetMixin` first, whose `get_extra_actions`
+        # would otherwise shadow the cached one below. Overrides are kept.
+        for klass in cls.__mro__:
+            if 'get_extra_actions' in klass.__dict__:
+                if klass is ViewSetMixin:
+                    cls.get_extra_actions = BaseGenericViewSet.__dict__[
+                        'get_extra_actions'
+                    ]
+                break
+
     @classmethod
     def get_extra_actions(cls):
-        """Get the methods that are marked as an extra ViewSet `@action`."""
-        return [method for _, method in getmembers(cls, _is_extra_action)]
+        """Get the methods that are marked as an extra ViewSet `@action`.
+
+        They are looked up once per class.
+        """
+        actions = cls.__dict__.get('_extra_actions')
+        if actions is None:
+            actions = [
+                method for _, method in getmembers(cls, _is_extra_action)
+            ]
+            cls._extra_actions = actions
+        return actions
+
+
+def encode_watermark(watermark):
+    return b64encode(
+        json.dumps(watermark, separators=(',', ':')).encode()
+    ).decode('ascii')
+
+
+def after(queryset, time_field, position):
+    """Filter `queryset` to the rows after the (time, pk) `position`."""
+    if position is None:
+        return queryset
+    time, pk = position
+    return queryset.filter(**{time_field + '__gte': time}).filter(
+        Q(**{time_field + '__gt': time})
+        | Q(**{time_field: time, 'pk__gt': pk})
+    )
+
+
+class ChangesMixin(object):
+    """
+    Add a `changes` action to a viewset of a model using
+    `TimeStampedMixin`, returning the rows modified and the primary keys
+    of the rows deleted since the `watermark` of the previous call, and the
+    watermark of the next. Without a watermark, it starts from the oldest
+    row. While `more` is true the client should call again at once.
+
+    Rows and tombstones are walked in (time, id) order over their indexes,
+    so a sync costs as much as the changes it returns. Only changes older
+    than `CHANGES_SETTLE_SECONDS` are returned, so that the transactions
+    still running, and the replicas, catch up before the watermark moves
+    past them.
+
+    The tombstones of the deleted rows are kept for
+    `TOMBSTONE_RETENTION_DAYS`, so a watermark issued before that is
+    answered with 410 Gone and the client has to sync from the start.
+    """
+
+    changes_page_size = 500
+    watermark_query_param = 'watermark'
+
+    @action(detail=False, methods=['get'], renderer_classes=[JSONRenderer])
+    def changes(self, request, *args, **kwargs):
+        """Return the rows modified and deleted since the watermark."""
+        queryset = self.filter_queryset(self.get_queryset())
+        model = queryset.model
+        modified, deleted = self.decode_watermark(request, model)
+        settled = timezone.now() - timedelta(
+            seconds=settings.CHANGES_SETTLE_SECONDS
+        )
+        size = self.changes_page_size
+
+        rows = list(after(
+            queryset.filter(last_modified__lt=settled),
+            'last_modified', modified
+        ).order_by('last_modified', 'pk')[:size + 1])
+
+        tombstones = list(after(
+            Tombstone.objects.filter(
+                content_type=ContentType.objects.get_for_model(model),
+                deleted_date__lt=settled
+            ),
+            'deleted_date', deleted
+        ).order_by('deleted_date', 'pk').values_list(
+            'deleted_date', 'pk', 'object_id'
+        )[:size + 1])
+
+        # Every row deleted before `synced` is in the client's hands.
+        synced = settled
+        if len(tombstones) > size:
+            synced = tombstones[size - 1][0]
+        more = len(rows) > size or len(tombstones) > size
+        rows = rows[:size]
+        tombstones = tombstones[:size]
+        if rows:
+            modified = (rows[-1].last_modified, rows[-1].pk)
+        if tombstones:
+            deleted = tombstones[-1][:2]
+
+        return Response({
+            'results': self.get_serializer(rows, many=True).data,
+            'deleted': [
+                model._meta.pk.to_python(object_id)
+                for _, _, object_id in tombstones
+            ],
+            'watermark': encode_watermark({
+                'm': modified and [modified[0].isoformat(), modified[1]],
+                'd': deleted and [deleted[0].isoformat(), deleted[1]],
+                's': synced.isoformat(),
+            }),
+            'more': more,
+        })
+
+    def decode_watermark(self, request, model):
+        """
+        Return the (time, pk) positions of the rows and tombstones, raise
+        WatermarkExpired when tombstones after it may have been pruned.
+        """
+        encoded = request.query_params.get(self.watermark_query_param)
+        if encoded is None:
+            return None, None
+
+        try:
+            watermark = json.loads(b64decode(encoded.encode('ascii')))
+            synced = parse_datetime(watermark['s'])
+            if synced < Tombstone.retention_cutoff():
+                raise WatermarkExpired()
+            positions = []
+            for key, pk_field in (('m', model._meta.pk),
+                                  ('d', Tombstone._meta.pk)):
+                position = watermark[key]
+                if position is not None:
+                    time = parse_datetime(position[0])
+                    if time is None:
+                        raise ValueError()
+                    position = (time, pk_field.to_python(position[1]))
+                positions.append(position)
+            return positions
+        except (
+            TypeError, ValueError, KeyError, IndexError, BinasciiError,
+            DjangoValidationError
+        ):
+            raise ValidationError(
+                {self.watermark_query_param: 'Invalid watermark.'}
+            )
@@ -1,12 +1,24 @@
 """Model mixins"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.db.models import JSONField
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.fields.json import KeyTextTransform, KeyTransform
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 
 
 # Create your models here.
 class TimeStampedMixin(models.Model):
-    """Define 'created_date' and 'last_modified' fields"""
+    """Define 'created_date' and 'last_modified' fields
+
+    The models declaring their own Meta inherit `TimeStampedMixin.Meta` to
+    keep the index of `utils.mixins.ChangesMixin`.
+    """
 
     created_date = models.DateTimeField(
         editable=False,
@@ -28,11 +40,109 @@ class TimeStampedMixin(models.Model):
         "abstract because is common information for the models"
 
         abstract = True
+        # Walks the changes in order, see utils.mixins.ChangesMixin.
+        indexes = [
+            models.Index(
+                fields=['last_modified', 'id'],
+                name='%(app_label)s_%(class)s_sync'
+            ),
+        ]
+
+
+class Tombstone(models.Model):
+    """Primary key of a deleted row of a model using `TimeStampedMixin`
+
+    Tombstones are kept for `TOMBSTONE_RETENTION_DAYS`, then deleted by the
+    `prune_tombstones` command.
+    """
+
+    content_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    object_id = models.CharField(max_length=64)
+    deleted_date = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name=_('deleted date')
+    )
+
+    class Meta:
+        """Define the behavior of Model."""
+
+        indexes = [
+            models.Index(
+                fields=['content_type', 'deleted_date', 'id'],
+                name='utils_tombstone_sync'
+            ),
+        ]
+
+    @staticmethod
+    def retention_cutoff():
+        """Return the time before which tombstones may have been pruned."""
+        return timezone.now() - timedelta(
+            days=settings.TOMBSTONE_RETENTION_DAYS
+        )
+
+
+def json_key(key, field='data', text=False):
+    """
+    Return the expression of `key` inside the JSON `field`, with `__`
+    separating nested keys. `text` extracts it as text (`->>`).
+    """
+    expression = field
+    parts = key.split(LOOKUP_SEP)
+    for part in parts[:-1]:
+        expression = KeyTransform(part, expression)
+    transform = KeyTextTransform if text else KeyTransform
+    return transform(parts[-1], expression)
+
+
+def json_key_index(key, name, field='data'):
+    """
+    Index of one key of the JSON `field`, used by `filter(data__key=...)`
+    and by ordering on it. Add it to `Meta.indexes` of the model.
+    """
+    return models.Index(json_key(key, field), name=name)
+
+
+def json_gin_index(name, field='data'):
+    """
+    GIN index of the whole JSON `field`, used by containment lookups like
+    `filter(data__contains={'key': value})`. PostgreSQL only.
+    """
+    return GinIndex(fields=[field], name=name, opclasses=['jsonb_path_ops'])
+
+
+def projection_name(key, field='data'):
+    """Name of the annotation of `key` made by `JsonQuerySet.project()`."""
+    return '{0}_{1}'.format(field, key.replace(LOOKUP_SEP, '_'))
+
+
+class JsonQuerySet(models.QuerySet):
+    """QuerySet of models with JSON fields."""
+
+    def project(self, *keys, field='data'):
+        """
+        Annotate the `keys` of the JSON `field` as `projection_name(key)`
+        and defer the field, so that only those keys are fetched.
+        """
+        return self.annotate(**{
+            projection_name(key, field): json_key(key, field)
+            for key in keys
+        }).defer(field)
 
 
 class JsonMixin(models.Model):
+    """
+    Define the 'data' JSON field. Declare indexes of the keys filtered on
+    with `json_key_index()` and `json_gin_index()`.
+    """
+
     data = JSONField(null=True, blank=True)
 
+    objects = JsonQuerySet.as_manager()
+
     class Meta:
         "abstract because is common information for the models"
 
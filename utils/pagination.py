@@ -0,0 +1,243 @@
+"""Pagination policies."""
+import json
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+
+from django.core.exceptions import (
+    FieldDoesNotExist, ImproperlyConfigured, ValidationError
+)
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def estimate_count(queryset):
+    """
+    Return the number of rows of `queryset` as estimated by the PostgreSQL
+    planner, which costs the same for any table size. Other databases, and
+    tables without statistics yet, get an exact count.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    if not queryset.query.has_filters():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)',
+                [connection.ops.quote_name(queryset.model._meta.db_table)]
+            )
+            row = cursor.fetchone()
+        if row is not None and row[0] >= 0:
+            return int(row[0])
+        return queryset.count()
+
+    # QuerySet.explain() returns the plan as text, read the JSON instead.
+    sql, params = queryset.order_by().query.get_compiler(
+        queryset.db
+    ).as_sql()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Django paginator counting unfiltered querysets by `estimate_count`."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if hasattr(queryset, 'query') and not queryset.query.has_filters():
+            return estimate_count(queryset)
+        return super(EstimatedCountPaginator, self).count
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginate by the values of the ordering fields of the last row seen
+    (keyset pagination), so every page costs an index range scan of
+    `page_size` rows whatever its depth.
+
+    The ordering is the `ordering` of the view, or the `Meta.ordering` of
+    the model, always followed by the primary key to break ties, and may
+    not use nullable fields. Cursors are opaque, and walk both forwards and
+    backwards.
+
+    Counts are left out unless the `pagination_count` of the view (or
+    `count_mode`) is 'exact' for a `COUNT(*)` or 'estimate' for the
+    planner estimate of `estimate_count`.
+    """
+
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    count_mode = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.ordering = self.get_ordering(queryset, view)
+        self.fields = [
+            self.get_field(queryset.model, name.lstrip('-'))
+            for name in self.ordering
+        ]
+        self.count = self.get_count(queryset, view)
+
+        values, self.backwards = self.decode_cursor(request)
+        ordering = self.ordering
+        if self.backwards:
+            ordering = [self.invert(name) for name in ordering]
+
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self.keyset_filter(ordering, values))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.backwards:
+            results.reverse()
+
+        self.next_values = self.previous_values = None
+        if results and (has_more if not self.backwards else True):
+            self.next_values = self.get_values(results[-1])
+        if results and (has_more if self.backwards else values is not None):
+            self.previous_values = self.get_values(results[0])
+
+        return results
+
+    def get_paginated_response(self, data):
+        response = {
+            'next': self.get_link(self.next_values, backwards=False),
+            'previous': self.get_link(self.previous_values, backwards=True),
+            'results': data,
+        }
+        if self.count is not None:
+            response['count'] = self.count
+        return Response(response)
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                return _positive_int(
+                    request.query_params[self.page_size_query_param],
+                    strict=True,
+                    cutoff=self.max_page_size
+                )
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_ordering(self, queryset, view):
+        """Return the ordering of the view, ending with the primary key."""
+        ordering = getattr(view, 'ordering', None)
+        if ordering is None:
+            ordering = queryset.model._meta.ordering
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+
+        ordering = list(ordering)
+        pk_name = queryset.model._meta.pk.name
+        if not {'pk', pk_name} & {name.lstrip('-') for name in ordering}:
+            ordering.append(pk_name)
+        return ordering
+
+    def get_field(self, model, name):
+        if name == 'pk':
+            return model._meta.pk
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            raise ImproperlyConfigured(
+                'KeysetPagination can only order by fields of the model, '
+                'not by "{0}".'.format(name)
+            )
+        # Rows after a NULL can not be selected by comparison, and
+        # databases disagree on where NULLs sort.
+        if field.null:
+            raise ImproperlyConfigured(
+                'KeysetPagination can not order by the nullable field '
+                '"{0}".'.format(name)
+            )
+        return field
+
+    def get_count(self, queryset, view):
+        mode = getattr(view, 'pagination_count', self.count_mode)
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'estimate':
+            return estimate_count(queryset)
+        return None
+
+    @staticmethod
+    def invert(name):
+        return name[1:] if name.startswith('-') else '-' + name
+
+    def keyset_filter(self, ordering, values):
+        """Return the condition selecting the rows after `values`."""
+        condition = Q()
+        equal = Q()
+        for name, field, value in zip(ordering, self.fields, values):
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            condition |= equal & Q(**{
+                '{0}__{1}'.format(field.attname, lookup): value
+            })
+            equal &= Q(**{field.attname: value})
+        return condition
+
+    def get_values(self, instance):
+        return [field.value_to_string(instance) for field in self.fields]
+
+    def decode_cursor(self, request):
+        """Return the values and direction of the cursor of the request."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+
+        try:
+            cursor = json.loads(b64decode(encoded.encode('ascii')))
+            values = [
+                field.to_python(value)
+                for field, value in zip(self.fields, cursor['v'])
+            ]
+            if len(values) != len(self.fields):
+                raise ValueError()
+            return values, bool(cursor.get('b'))
+        except (
+            TypeError, ValueError, KeyError, BinasciiError, ValidationError
+        ):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_link(self, values, backwards):
+        if values is None:
+            return None
+
+        url = self.request.build_absolute_uri()
+        cursor = {'v': values}
+        if backwards:
+            cursor['b'] = 1
+        encoded = b64encode(
+            json.dumps(cursor, separators=(',', ':')).encode()
+        ).decode('ascii')
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_html_context(self):
+        return {
+            'previous_url': self.get_link(self.previous_values, True),
+            'next_url': self.get_link(self.next_values, False),
+        }
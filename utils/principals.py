@@ -0,0 +1,78 @@
+"""Lightweight users built from token claims."""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import _user_has_module_perms, _user_has_perm
+
+
+class TokenUser(object):
+    """
+    Authenticated user built from the claims of a verified token, standing
+    in for the user model where only its identity and flags are needed.
+
+    Permission checks go through the authentication backends like those of
+    the model; `get_user` loads the model instance when a view needs it.
+    """
+
+    __slots__ = (
+        'pk', 'email', 'is_staff', 'is_active', 'is_superuser',
+        'permission_version', '_user'
+    )
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, pk, email, is_staff, is_active, is_superuser,
+                 permission_version):
+        self.pk = pk
+        self.email = email
+        self.is_staff = is_staff
+        self.is_active = is_active
+        self.is_superuser = is_superuser
+        self.permission_version = permission_version
+        self._user = None
+
+    @classmethod
+    def from_payload(cls, payload):
+        """Build the user from the payload of a token with claims."""
+        return cls(
+            pk=payload['user_id'],
+            email=payload['email'],
+            is_staff=payload['is_staff'],
+            is_active=payload['is_active'],
+            is_superuser=payload['is_superuser'],
+            permission_version=payload['pv']
+        )
+
+    @property
+    def id(self):
+        return self.pk
+
+    def __str__(self):
+        return self.email
+
+    def __eq__(self, other):
+        return getattr(other, 'pk', None) == self.pk
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def get_username(self):
+        return self.email
+
+    def get_user(self):
+        """Return the model instance of the user, loading it once."""
+        if self._user is None:
+            self._user = get_user_model()._default_manager.get(pk=self.pk)
+        return self._user
+
+    def has_perm(self, perm, obj=None):
+        if self.is_active and self.is_superuser:
+            return True
+        return _user_has_perm(self, perm, obj)
+
+    def has_perms(self, perm_list, obj=None):
+        return all(self.has_perm(perm, obj) for perm in perm_list)
+
+    def has_module_perms(self, app_label):
+        if self.is_active and self.is_superuser:
+            return True
+        return _user_has_module_perms(self, app_label)
@@ -0,0 +1,59 @@
+"""Renderers for the streaming and plain text formats of the API."""
+import csv
+import io
+import json
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class JSONLinesRenderer(BaseRenderer):
+    """Render a list of objects as one JSON document per line."""
+
+    media_type = 'application/x-ndjson'
+    format = 'jsonl'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, dict):
+            data = [data]
+        return ''.join(
+            json.dumps(item, cls=JSONEncoder) + '\n' for item in data
+        ).encode(self.charset)
+
+
+class CSVRenderer(BaseRenderer):
+    """Render a list of flat objects as CSV with a header row."""
+
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not data:
+            return b''
+        if isinstance(data, dict):
+            data = [data]
+
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=list(data[0]))
+        writer.writeheader()
+        writer.writerows(data)
+        return buffer.getvalue().encode(self.charset)
+
+
+class PrometheusRenderer(BaseRenderer):
+    """Render metrics text in the Prometheus exposition format."""
+
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not isinstance(data, str):
+            data = json.dumps(data, cls=JSONEncoder)
+        return data.encode(self.charset)
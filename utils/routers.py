@@ -1,5 +1,54 @@
+from django.utils.module_loading import import_string
+
 from rest_framework.routers import DynamicRoute, Route
-from rest_framework.routers import SimpleRouter as BaseRouter
+from rest_framework.routers import SimpleRouter as DRFSimpleRouter
+from rest_framework.routers import escape_curly_brackets
+
+
+class BaseRouter(DRFSimpleRouter):
+    """
+    Router that fills the `{methodnamehyphen}` placeholder of its dynamic
+    routes with the `@action` url path, underscores turned to hyphens, and
+    names them by the `url_name` of the action.
+
+    Viewsets may be registered by dotted path. They are imported when the
+    URLs are first generated, all of them at once: the routes of a viewset
+    depend on its class (extra actions, handler methods, lookup), so they
+    can't be generated before it is imported.
+    """
+
+    def register(self, prefix, viewset, basename=None):
+        if basename is None and not isinstance(viewset, str):
+            basename = self.get_default_basename(viewset)
+        self.registry.append((prefix, viewset, basename))
+
+        if hasattr(self, '_urls'):
+            del self._urls
+
+    def load_registry(self):
+        """Import the viewsets registered by dotted path."""
+        registry = []
+        for prefix, viewset, basename in self.registry:
+            if isinstance(viewset, str):
+                viewset = import_string(viewset)
+            if basename is None:
+                basename = self.get_default_basename(viewset)
+            registry.append((prefix, viewset, basename))
+        self.registry = registry
+
+    def get_urls(self):
+        self.load_registry()
+        return super(BaseRouter, self).get_urls()
+
+    def _get_dynamic_route(self, route, action):
+        route = super(BaseRouter, self)._get_dynamic_route(route, action)
+        methodnamehyphen = action.url_path.replace('_', '-')
+        return route._replace(
+            url=route.url.replace(
+                '{methodnamehyphen}', escape_curly_brackets(methodnamehyphen)
+            ),
+            name=route.name.replace('{methodnamehyphen}', action.url_name)
+        )
 
 
 class SimpleRouter(BaseRouter):
@@ -59,11 +108,8 @@ class DefaultRouter(SimpleRouter):
 
     def register(self, prefix, viewset, basename=None, router_class=None):
         """
-        Append the given viewset to the proper registry.
+        Append the given viewset, or its dotted path, to the proper registry.
         """
-        if basename is None:
-            basename = self.get_default_basename(viewset)
-
         if router_class is not None:
             kwargs = {'trailing_slash': bool(self.trailing_slash)}
             single_object_router_classes = (
@@ -75,19 +121,29 @@ class DefaultRouter(SimpleRouter):
                 self._single_object_registry.append(router)
 
         else:
-            self.registry.append((prefix, viewset, basename))
+            super(DefaultRouter, self).register(prefix, viewset, basename)
 
     def get_urls(self):
         """
         Generate the list of URL patterns including the registered single
         object routers urls.
         """
-        base_urls = super(SimpleRouter, self).get_urls()
+        base_urls = super(DefaultRouter, self).get_urls()
         single_urls = sum([r.urls for r in self._single_object_registry], [])
         nested_urls = sum([r.urls for r in self._nested_object_registry], [])
 
         return base_urls + single_urls + nested_urls
 
+    @property
+    def urlpatterns(self):
+        """
+        The URL patterns, generated on first access so that a resolver built
+        on the router (rather than `router.urls`) imports no viewset until
+        the first request is resolved or URL reversed, which then imports
+        every viewset registered by dotted path.
+        """
+        return self.urls
+
 
 class AuthenticationRouter(BaseRouter):
     """
@@ -0,0 +1,8 @@
+"""Utils API routes."""
+from app.urls import router
+
+router.register(
+    r'metrics',
+    'utils.api.MetricsViewSet',
+    basename="metrics",
+)
@@ -0,0 +1,153 @@
+"""Common serializer fields, and compiled read only serializers."""
+from functools import lru_cache
+from operator import attrgetter
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Manager
+from django.db.models.constants import LOOKUP_SEP
+
+from rest_framework import serializers
+from rest_framework.fields import Field, SkipField, is_simple_callable
+from rest_framework.relations import PKOnlyObject
+
+from utils.models import projection_name
+
+
+class JsonKeyField(serializers.Field):
+    """
+    Read only value of `key` in the JSON `field` of the instance. Reads
+    the annotation of `JsonQuerySet.project()` when the queryset made it,
+    the field itself otherwise.
+    """
+
+    def __init__(self, key, field='data', **kwargs):
+        self.key = key
+        self.json_field = field
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super(JsonKeyField, self).__init__(**kwargs)
+
+    def to_representation(self, instance):
+        name = projection_name(self.key, self.json_field)
+        if name in instance.__dict__:
+            return instance.__dict__[name]
+
+        value = getattr(instance, self.json_field)
+        for part in self.key.split(LOOKUP_SEP):
+            if not isinstance(value, dict):
+                return None
+            value = value.get(part)
+        return value
+
+
+def projected_keys(serializer_class, field='data'):
+    """
+    Return the keys of `field` read by the `JsonKeyField`s of a serializer,
+    for `queryset.project(*keys)`.
+    """
+    return [
+        serializer_field.key
+        for serializer_field in serializer_class().fields.values()
+        if isinstance(serializer_field, JsonKeyField)
+        and serializer_field.json_field == field
+    ]
+
+
+def _identity(value):
+    return value
+
+
+def _compile_getter(field):
+    """Return the function reading the attribute of `field`."""
+    if type(field).get_attribute is not Field.get_attribute:
+        return field.get_attribute
+    if not field.source_attrs:
+        return _identity
+
+    path = attrgetter('.'.join(field.source_attrs))
+
+    def get_attribute(instance):
+        try:
+            value = path(instance)
+        except (AttributeError, KeyError, ObjectDoesNotExist):
+            # Defaults, mappings and missing values, the way DRF does.
+            return field.get_attribute(instance)
+        if callable(value) and is_simple_callable(value):
+            value = value()
+        return value
+    return get_attribute
+
+
+def _compile_field(serializer, field):
+    """Return the function turning the attribute of `field` to data."""
+    if isinstance(field, serializers.ListSerializer):
+        child = _compile(field.child).to_representation
+
+        def to_representation(value):
+            if isinstance(value, Manager):
+                value = value.all()
+            return [child(item) for item in value]
+        return to_representation
+    if isinstance(field, serializers.BaseSerializer):
+        return _compile(field).to_representation
+    if isinstance(field, serializers.SerializerMethodField):
+        return getattr(serializer, field.method_name)
+    if type(field) is serializers.ReadOnlyField:
+        return _identity
+    return field.to_representation
+
+
+class CompiledSerializer(object):
+    """
+    Read only serializer made of the (name, getter, converter) of each
+    field of a serializer instance, see `compile_serializer()`.
+    """
+
+    __slots__ = ('fields',)
+
+    def __init__(self, fields):
+        self.fields = fields
+
+    def to_representation(self, instance):
+        ret = {}
+        for name, get_attribute, to_representation in self.fields:
+            try:
+                attribute = get_attribute(instance)
+            except SkipField:
+                continue
+            if isinstance(attribute, PKOnlyObject):
+                check_for_none = attribute.pk
+            else:
+                check_for_none = attribute
+            if check_for_none is None:
+                ret[name] = None
+            else:
+                ret[name] = to_representation(attribute)
+        return ret
+
+    def many(self, instances):
+        return [self.to_representation(instance) for instance in instances]
+
+
+def _compile(serializer):
+    return CompiledSerializer(tuple(
+        (
+            field.field_name,
+            _compile_getter(field),
+            _compile_field(serializer, field),
+        )
+        for field in serializer.fields.values()
+        if not field.write_only
+    ))
+
+
+@lru_cache(maxsize=None)
+def compile_serializer(serializer_class):
+    """
+    Return the `CompiledSerializer` of a serializer class, whose output is
+    the `data` of the serializer, built once instead of per instance.
+
+    Only for serializers whose fields do not depend on the context: method
+    fields are called on an instance of the serializer without context.
+    """
+    return _compile(serializer_class())
@@ -0,0 +1,17 @@
+"""Signal receivers of the common models."""
+from django.contrib.contenttypes.models import ContentType
+
+from utils.models import Tombstone
+
+
+def bury(sender, instance, using, **kwargs):
+    """
+    Leave a tombstone of a deleted row. Connected to the `post_delete` of
+    each model using `TimeStampedMixin` by `utils.apps.UtilsConfig`.
+    """
+    Tombstone.objects.using(using).create(
+        content_type=ContentType.objects.db_manager(using).get_for_model(
+            sender
+        ),
+        object_id=str(instance.pk)
+    )
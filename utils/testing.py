@@ -0,0 +1,105 @@
+"""Test helpers."""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+def iter_routes(router):
+    """
+    Yield (url name, viewset, HTTP method, action) for every route of
+    `router`, its own registry first, then its single object routers.
+    """
+    router.urls  # Imports the viewsets registered by dotted path.
+    routers = [router] + list(getattr(router, '_single_object_registry', []))
+    for sub_router in routers:
+        for prefix, viewset, basename in sub_router.registry:
+            for route in sub_router.get_routes(viewset):
+                mapping = sub_router.get_method_map(viewset, route.mapping)
+                name = route.name.format(basename=basename)
+                for method, action in mapping.items():
+                    yield name, viewset, method, action
+
+
+class QueryBudgetMixin(object):
+    """
+    Call every route of `router` with the data seeded at each of `sizes`
+    and fail when its query count grows with the data, or goes over the
+    budget of the action in the `query_budgets` dict of the viewset.
+
+    Mix it in an `APITestCase`, which defines `seed(size)`, and
+    `get_request(name, action, size)` for the routes that need a body,
+    credentials or a lookup value.
+    """
+
+    router = None
+    sizes = (1, 10)
+
+    def seed(self, size):
+        """Create the fixtures of one data size."""
+        raise NotImplementedError('`seed()` must be implemented.')
+
+    def get_request(self, name, action, size):
+        """
+        Return the (data, headers, url kwargs) of the request to route
+        `name`, or `None` to skip it. Only bodiless requests are made by
+        default.
+        """
+        return {}, {}, {}
+
+    def reset(self):
+        """Forget the state cached by previous requests."""
+
+    def count_queries(self, name, method, action, size):
+        request = self.get_request(name, action, size)
+        if request is None:
+            return None
+        data, headers, kwargs = request
+
+        self.reset()
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(
+                reverse(name, kwargs=kwargs or None),
+                data=data,
+                format='json',
+                **headers
+            )
+            if response.streaming:
+                b''.join(response.streaming_content)
+
+        self.assertLess(
+            response.status_code, 400,
+            '{0} {1} answered {2}'.format(
+                method.upper(), name, response.status_code
+            )
+        )
+        return len(queries)
+
+    def test_query_budgets(self):
+        counts = {}
+        for size in self.sizes:
+            self.seed(size)
+            for route in iter_routes(self.router):
+                name, viewset, method, action = route
+                count = self.count_queries(name, method, action, size)
+                if count is not None:
+                    counts.setdefault(route, []).append(count)
+
+        self.assertTrue(counts, 'No route was called.')
+        for route, route_counts in counts.items():
+            name, viewset, method, action = route
+            label = '{0} {1}'.format(method.upper(), name)
+            with self.subTest(route=label):
+                self.assertLessEqual(
+                    max(route_counts), route_counts[0],
+                    'The queries of {0} grow with the data: {1}'.format(
+                        label, route_counts
+                    )
+                )
+                budget = getattr(viewset, 'query_budgets', {}).get(action)
+                if budget is not None:
+                    self.assertLessEqual(
+                        max(route_counts), budget,
+                        '{0} runs {1} queries, its budget is {2}'.format(
+                            label, max(route_counts), budget
+                        )
+                    )
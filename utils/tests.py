@@ -1,3 +1,969 @@
-from django.test import TestCase
+import asyncio
+import itertools
+import json
+import threading
+from base64 import b64decode
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection, connections, models
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import Resolver404, URLResolver, path as url_path
+from django.urls.resolvers import RegexPattern
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+import jwt
+
+from rest_framework import mixins, serializers, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import AuthenticationFailed, NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from users.api import ExportUserViewSet
+from users.backends import permission_cache, version_cache
+from users.models import User
+
+from utils import authentication
+from utils.authentication import JSONWebTokenAuthentication, user_cache
+from utils.cache import LRUCache
+from utils.db.pool import ConnectionPool, PoolTimeout
+from utils.db.routers import PRIMARY, ReplicaRouter, routing_state, user_key
+from utils.dispatch import TrieURLResolver, split_segments
+from utils.metrics import (
+    DURATION, HISTOGRAMS, HISTOGRAM_OFFSETS, MetricsStore, OVERFLOW_ROUTE,
+    read_slots
+)
+from utils.middlewares import (
+    AuthenticationMiddlewareJWT, ReplicaRoutingMiddleware
+)
+from utils.mixins import BaseGenericViewSet, encode_watermark
+from utils.models import (
+    JsonMixin, Tombstone, json_key_index, projection_name
+)
+from utils.pagination import KeysetPagination
+from utils.principals import TokenUser
+from utils.routers import SimpleRouter
+from utils.serializers import JsonKeyField, projected_keys
+from utils.throttling import BucketStore, PROBES, key_hash
+from utils.tokens import create_token
+
+
+class RequestScopedAuthenticationTestCase(TestCase):
+    """The middleware and DRF share one authentication per request."""
+
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user(
+            email='user@example.com',
+            password='secret',
+            name='User'
+        )
+        self.token = create_token(self.user)
+
+    def make_request(self):
+        request = RequestFactory().get(
+            '/api/me',
+            HTTP_AUTHORIZATION='Bearer {0}'.format(self.token)
+        )
+        SessionMiddleware(lambda r: None).process_request(request)
+        return request
+
+    def authenticate_both_layers(self, request):
+        def get_response(request):
+            middleware_user = request.user.pk
+            drf_request = Request(
+                request,
+                authenticators=[JSONWebTokenAuthentication()]
+            )
+            return middleware_user, drf_request.user.pk
+
+        return AuthenticationMiddlewareJWT(get_response)(request)
+
+    def test_single_query_per_request(self):
+        with self.assertNumQueries(1):
+            users = self.authenticate_both_layers(self.make_request())
+
+        self.assertEqual(users, (self.user.pk, self.user.pk))
+
+    def test_single_parse_and_decode_per_request(self):
+        get_jwt_value = JSONWebTokenAuthentication.get_jwt_value
+        decode = authentication.jwt_decode_handler
+
+        with mock.patch.object(
+            JSONWebTokenAuthentication, 'get_jwt_value',
+            autospec=True, side_effect=get_jwt_value
+        ) as parse, mock.patch.object(
+            authentication, 'jwt_decode_handler', side_effect=decode
+        ) as decode:
+            self.authenticate_both_layers(self.make_request())
+
+        self.assertEqual(parse.call_count, 1)
+        self.assertEqual(decode.call_count, 1)
+
+    def test_cached_token_skips_query(self):
+        self.authenticate_both_layers(self.make_request())
+
+        with self.assertNumQueries(0):
+            self.authenticate_both_layers(self.make_request())
+
+
+class LRUCacheTestCase(SimpleTestCase):
+    """Eviction, expiry and invalidation of the in-process cache."""
+
+    def setUp(self):
+        self.now = 0.0
+        self.cache = LRUCache(max_size=2, ttl=10, timer=lambda: self.now)
+
+    def test_evicts_least_recently_used(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.get('a')
+        self.cache.set('c', 3)
+
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('c'), 3)
+
+    def test_entries_expire(self):
+        self.cache.set('a', 1)
+        self.now = 10.0
+
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_invalidate_tag(self):
+        self.cache.set('a', 1, tag=7)
+        self.cache.set('b', 2, tag=8)
+        self.cache.invalidate(7)
+
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.get('b'), 2)
+
+    def test_stale_epoch_is_discarded(self):
+        epoch = self.cache.epoch
+        self.cache.invalidate(7)
+        self.cache.set('a', 1, tag=7, epoch=epoch)
+
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_counters(self):
+        self.cache.set('a', 1)
+        self.cache.get('a')
+        self.cache.get('b')
+
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+
+class UserCacheTestCase(TestCase):
+    """Verified tokens are cached until their user changes."""
+
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user(
+            email='user@example.com',
+            password='secret',
+            name='User'
+        )
+        self.token = create_token(self.user)
+
+    def test_cached_until_user_saved(self):
+        auth = JSONWebTokenAuthentication()
+        auth.authenticate_credentials(self.token)
+        with self.assertNumQueries(0):
+            auth.authenticate_credentials(self.token)
+
+        self.user.name = 'Renamed'
+        self.user.save()
+        with self.assertNumQueries(1):
+            user = auth.authenticate_credentials(self.token)
+        self.assertEqual(user.name, 'Renamed')
+
+    def test_forged_token_is_rejected(self):
+        payload = jwt.decode(self.token, verify=False)
+        forged = jwt.encode(payload, 'not the secret', algorithm='HS256')
+        if isinstance(forged, bytes):
+            forged = forged.decode()
+
+        with self.assertRaises(AuthenticationFailed):
+            JSONWebTokenAuthentication().authenticate_credentials(forged)
+        self.assertEqual(len(user_cache), 0)
+
+
+class KeysetPaginationTestCase(TestCase):
+    """Pages walk the rows by their ordering values."""
+
+    def setUp(self):
+        User.objects.bulk_create(
+            User(email='user{0}@example.com'.format(i), name='User')
+            for i in range(7)
+        )
+        self.emails = sorted(User.objects.values_list('email', flat=True))
+
+    def paginate(self, url='/users', view=None, **params):
+        paginator = KeysetPagination()
+        paginator.page_size = 3
+        request = Request(APIRequestFactory().get(url, params))
+        page = paginator.paginate_queryset(
+            User.objects.all(), request, view
+        )
+        return [user.email for user in page], paginator
+
+    def cursor(self, link):
+        return parse_qs(urlparse(link).query)['cursor'][0]
+
+    def test_forwards_and_backwards(self):
+        pages = []
+        page, paginator = self.paginate()
+        pages.append(page)
+        while paginator.next_values is not None:
+            link = paginator.get_link(paginator.next_values, False)
+            page, paginator = self.paginate(cursor=self.cursor(link))
+            pages.append(page)
+
+        self.assertEqual(sum(pages, []), self.emails)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+
+        link = paginator.get_link(paginator.previous_values, True)
+        page, paginator = self.paginate(cursor=self.cursor(link))
+        self.assertEqual(page, pages[1])
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(NotFound):
+            self.paginate(cursor='not-a-cursor')
+
+    def test_nullable_ordering_is_rejected(self):
+        view = mock.Mock(ordering=['last_modified'], pagination_count=None)
+        with self.assertRaises(ImproperlyConfigured):
+            self.paginate(view=view)
+
+
+class DispatchViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin,
+                      viewsets.GenericViewSet):
+
+    @action(detail=False)
+    def do_some_stuff(self, request):
+        pass
+
+    @action(detail=True, url_path=r'files/(?P<name>[a-z]+)')
+    def file(self, request, pk=None, name=None):
+        pass
+
+
+class TrieURLResolverTestCase(SimpleTestCase):
+    """The trie resolver matches the way Django's resolver does."""
+
+    paths = [
+        'api/things',
+        'api/things/42',
+        'api/things/do-some-stuff',
+        'api/things/files/report',
+        'api/others/7',
+        'api/plain/3',
+    ]
+    missing = [
+        'api/things/42/nothing',
+        'api/nothing',
+        'api/things/files/UPPER',
+        'other/things',
+    ]
+
+    def setUp(self):
+        router = SimpleRouter(trailing_slash=False)
+        router.register('things', DispatchViewSet, basename='thing')
+        router.register('others', DispatchViewSet, basename='other')
+        urls = router.urls + [
+            url_path('plain/<int:pk>', lambda request, pk: None, name='plain')
+        ]
+        self.django = URLResolver(RegexPattern(r'^api/'), urls)
+        self.trie = TrieURLResolver(RegexPattern(r'^api/'), urls)
+
+    def test_same_matches(self):
+        for path in self.paths:
+            with self.subTest(path=path):
+                expected = self.django.resolve(path)
+                match = self.trie.resolve(path)
+                self.assertEqual(match.func, expected.func)
+                self.assertEqual(match.args, expected.args)
+                self.assertEqual(match.kwargs, expected.kwargs)
+                self.assertEqual(match.url_name, expected.url_name)
+                self.assertEqual(match.route, expected.route)
+
+    def test_same_misses(self):
+        for path in self.missing:
+            with self.subTest(path=path):
+                with self.assertRaises(Resolver404):
+                    self.django.resolve(path)
+                with self.assertRaises(Resolver404):
+                    self.trie.resolve(path)
+
+    def test_action_url_names(self):
+        self.assertEqual(
+            self.trie.resolve('api/things/do-some-stuff').url_name,
+            'thing-do-some-stuff'
+        )
+        self.assertEqual(
+            self.trie.resolve('api/things/files/report').url_name,
+            'thing-file'
+        )
+
+    def test_split_segments(self):
+        self.assertEqual(
+            split_segments(r'^things/(?P<pk>[^/.]+)$'),
+            ['things', '(?P<pk>[^/.]+)']
+        )
+        self.assertIsNone(split_segments(r'^things/(?:a/b)$'))
+        self.assertIsNone(split_segments(r'things$'))
+
+
+class DottedPathRegistrationTestCase(SimpleTestCase):
+    """Viewsets registered by dotted path are imported together, with the
+    URLs."""
+
+    def test_imported_with_the_urls(self):
+        router = SimpleRouter(trailing_slash=False)
+        router.register('things', 'utils.tests.DispatchViewSet', 'thing')
+        router.register('others', 'utils.tests.DispatchViewSet', 'other')
+
+        with mock.patch(
+            'utils.routers.import_string', wraps=import_string
+        ) as imported:
+            self.assertEqual(
+                [viewset for _, viewset, _ in router.registry],
+                ['utils.tests.DispatchViewSet'] * 2
+            )
+            self.assertEqual(imported.call_count, 0)
+
+            resolver = URLResolver(RegexPattern(r'^api/'), router.urls)
+            self.assertEqual(imported.call_count, 2)
+            self.assertEqual(
+                resolver.resolve('api/others/7').url_name, 'other-detail'
+            )
+            router.urls
+            self.assertEqual(imported.call_count, 2)
+
+
+class ExtraActionsTestCase(SimpleTestCase):
+    """Extra actions are looked up once, unless a viewset overrides it."""
+
+    def test_cached(self):
+        class CachedViewSet(viewsets.GenericViewSet, BaseGenericViewSet):
+
+            @action(detail=False)
+            def stuff(self, request):
+                pass
+
+        actions = CachedViewSet.get_extra_actions()
+        self.assertEqual([a.__name__ for a in actions], ['stuff'])
+        self.assertIs(CachedViewSet.get_extra_actions(), actions)
+
+    def test_override_is_kept(self):
+        class OverridingViewSet(viewsets.GenericViewSet, BaseGenericViewSet):
+
+            @classmethod
+            def get_extra_actions(cls):
+                return []
+
+        class ChildViewSet(OverridingViewSet):
+            pass
+
+        self.assertEqual(OverridingViewSet.get_extra_actions(), [])
+        self.assertEqual(ChildViewSet.get_extra_actions(), [])
+
+
+class MetricsStoreTestCase(SimpleTestCase):
+    """Routes past the last slot share the overflow slot."""
+
+    def test_overflow(self):
+        store = MetricsStore(max_routes=3)
+        allocate = mock.patch.object(
+            store, '_allocate', side_effect=store._allocate
+        )
+        with allocate as allocated:
+            for _ in range(2):
+                for route in ('a', 'b', 'c', 'd'):
+                    store.observe(route, [(DURATION, 0.001)])
+
+        self.assertEqual(allocated.call_count, 4)
+        slots = dict(read_slots(store.snapshot()))
+        self.assertEqual(sorted(slots), ['a', 'b', OVERFLOW_ROUTE])
+
+        offset = HISTOGRAM_OFFSETS[DURATION]
+        end = offset + len(HISTOGRAMS[DURATION][2]) + 1
+        counts = {
+            route: sum(values[offset:end]) for route, values in slots.items()
+        }
+        self.assertEqual(counts, {'a': 2, 'b': 2, OVERFLOW_ROUTE: 4})
+
+
+class BucketStoreTestCase(SimpleTestCase):
+    """Buckets can't be evicted by keys computed to collide with them."""
+
+    victim = 'victim@example.com'
+
+    def colliding_keys(self, size):
+        """Keys starting their probes at the slot of the victim."""
+        slot = key_hash('login:' + self.victim) % size
+        keys = (
+            'attacker{0}@example.com'.format(i) for i in itertools.count()
+        )
+        return list(itertools.islice(
+            (key for key in keys if key_hash('login:' + key) % size == slot),
+            PROBES
+        ))
+
+    def victim_evicted(self, keys, size):
+        store = BucketStore(size=size)
+        for wait in [0, 60]:
+            self.assertEqual(
+                store.take('login', self.victim, 1 / 60, 1, now=0), wait
+            )
+        for key in keys:
+            store.take('login', key, 1 / 60, 1, now=1)
+        return store.take('login', self.victim, 1 / 60, 1, now=2) == 0
+
+    def test_targeted_eviction(self):
+        with override_settings(SECRET_KEY='guessed'):
+            keys = self.colliding_keys(256)
+            self.assertTrue(self.victim_evicted(keys, 256))
+
+        with override_settings(SECRET_KEY='server'):
+            self.assertFalse(self.victim_evicted(keys, 256))
+
+
+class FakeTimer(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ConnectionPoolTestCase(SimpleTestCase):
+    """Checkout, return, idle checks and timeouts of the pool."""
+
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.opened = []
+        self.closed = []
+        self.healthy = set()
+
+    def make_pool(self, **kwargs):
+        def connect():
+            connection = len(self.opened)
+            self.opened.append(connection)
+            self.healthy.add(connection)
+            return connection
+
+        kwargs.setdefault('check', lambda c: c in self.healthy)
+        return ConnectionPool(
+            connect, self.closed.append, timer=self.timer, **kwargs
+        )
+
+    def test_checkout_and_return(self):
+        pool = self.make_pool(max_size=2)
+        first, second = pool.acquire(), pool.acquire()
+        self.assertEqual(pool.stats()['in_use'], 2)
+
+        pool.release(first)
+        pool.release(second)
+        self.assertEqual(pool.acquire(), second)
+        self.assertEqual(pool.acquire(), first)
+
+        stats = pool.stats()
+        self.assertEqual(stats['connects'], 2)
+        self.assertEqual(stats['checkouts'], 4)
+        self.assertEqual(stats['size'], 2)
+
+    def test_fill(self):
+        pool = self.make_pool(min_size=2)
+        pool.fill()
+        self.assertEqual(pool.stats()['idle'], 2)
+        self.assertEqual(len(self.opened), 2)
+
+    def test_reset_discards(self):
+        pool = self.make_pool(reset=lambda c: False)
+        pool.release(pool.acquire())
+        self.assertEqual(self.closed, [0])
+        self.assertEqual(pool.stats()['size'], 0)
+        self.assertEqual(pool.stats()['discarded'], 1)
+
+    def test_idle_check(self):
+        pool = self.make_pool(check_idle=5)
+        connection = pool.acquire()
+        pool.release(connection)
+
+        # Not checked before `check_idle`.
+        self.healthy.discard(connection)
+        self.timer.now = 4
+        self.assertEqual(pool.acquire(), connection)
+        pool.release(connection)
+
+        # Checked after, and replaced when broken.
+        self.timer.now = 10
+        self.assertEqual(pool.acquire(), 1)
+        self.assertEqual(self.closed, [connection])
+        self.assertEqual(pool.stats()['discarded'], 1)
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_max_idle(self):
+        pool = self.make_pool(min_size=1, max_idle=60)
+        first, second = pool.acquire(), pool.acquire()
+        pool.release(first)
+        self.timer.now = 100
+        pool.release(second)
+
+        self.assertEqual(self.closed, [first])
+        self.assertEqual(pool.stats()['size'], 1)
+        self.assertEqual(pool.acquire(), second)
+
+    def test_timeout(self):
+        pool = self.make_pool(max_size=1, timeout=0)
+        connection = pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+        pool.release(connection)
+        self.assertEqual(pool.acquire(), connection)
+
+    def test_waits_for_release(self):
+        pool = ConnectionPool(object, lambda c: None, max_size=1, timeout=5)
+        connection = pool.acquire()
+        timer = threading.Timer(0.05, pool.release, [connection])
+        timer.start()
+        self.assertIs(pool.acquire(), connection)
+        timer.join()
+        self.assertGreater(pool.stats()['wait_time'], 0)
+
+    def test_close(self):
+        pool = self.make_pool()
+        first, second = pool.acquire(), pool.acquire()
+        pool.release(first)
+        pool.close()
+        self.assertEqual(self.closed, [first])
+        pool.release(second)
+        self.assertEqual(self.closed, [first, second])
+        self.assertEqual(pool.stats()['size'], 0)
+
+
+@override_settings(DATABASE_REPLICAS=['replica_0'])
+class ReplicaRoutingTestCase(TestCase):
+    """Reads stay on the primary after a write of the verified user."""
+
+    def setUp(self):
+        user_cache.clear()
+        caches['default'].clear()
+        self.user = User.objects.create_user(
+            email='user@example.com',
+            password='secret',
+            name='User'
+        )
+        self.token = create_token(self.user)
+        self.router = ReplicaRouter()
+        self.router.health.is_healthy = lambda alias: True
+
+    def route(self, token=None):
+        """Return the routing state and read database of a request."""
+        headers = {}
+        if token is not None:
+            headers['HTTP_AUTHORIZATION'] = 'Bearer {0}'.format(token)
+        request = RequestFactory().get('/api/me', **headers)
+        SessionMiddleware(lambda r: None).process_request(request)
+
+        def get_response(request):
+            # Outside of the test's transaction.
+            with mock.patch.object(
+                connections[PRIMARY], 'in_atomic_block', False
+            ):
+                return routing_state.get(), self.router.db_for_read(User)
+
+        return AuthenticationMiddlewareJWT(
+            ReplicaRoutingMiddleware(get_response)
+        )(request)
+
+    def test_verified_user(self):
+        state, _ = self.route(self.token)
+        self.assertEqual(state.keys, [user_key(self.user.pk)])
+
+    def test_forged_token(self):
+        payload = jwt.decode(self.token, verify=False)
+        payload['user_id'] += 1
+        forged = jwt.encode(payload, 'not the secret', algorithm='HS256')
+        if isinstance(forged, bytes):
+            forged = forged.decode()
+
+        state, _ = self.route(forged)
+        self.assertEqual(state.keys, ['sticky:client:127.0.0.1'])
+
+    def test_pinned_after_write(self):
+        self.assertEqual(self.route(self.token)[1], 'replica_0')
+
+        self.assertEqual(
+            self.router.db_for_write(User, instance=self.user), PRIMARY
+        )
+        self.assertTrue(caches['default'].get(user_key(self.user.pk)))
+
+        state, database = self.route(self.token)
+        self.assertTrue(state.pinned)
+        self.assertEqual(database, PRIMARY)
+        self.assertEqual(self.route()[1], 'replica_0')
+
+    def test_async(self):
+        caches['default'].set('sticky:client:127.0.0.1', True)
+        request = RequestFactory().get('/api/me')
+        SessionMiddleware(lambda r: None).process_request(request)
+
+        async def get_response(request):
+            return routing_state.get()
+
+        middleware = AuthenticationMiddlewareJWT(
+            ReplicaRoutingMiddleware(get_response)
+        )
+        state = asyncio.run(middleware(request))
+        self.assertEqual(state.keys, ['sticky:client:127.0.0.1'])
+        self.assertTrue(state.pinned)
+        self.assertIsNone(routing_state.get())
+
+
+@override_settings(CHANGES_SETTLE_SECONDS=0, TOMBSTONE_RETENTION_DAYS=30)
+class TombstoneTestCase(TestCase):
+    """Deleted rows are synced until their tombstones are pruned."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email='admin@example.com',
+            password='secret',
+            name='Admin'
+        )
+        self.user = User.objects.create_user(
+            email='user@example.com',
+            password='secret',
+            name='User'
+        )
+
+    def changes(self, watermark=None):
+        params = {} if watermark is None else {'watermark': watermark}
+        request = APIRequestFactory().get('/api/export/changes', params)
+        force_authenticate(request, user=self.admin)
+        view = ExportUserViewSet.as_view({'get': 'changes'})
+        return view(request)
+
+    def test_bury_timestamped_models_only(self):
+        Group.objects.create(name='group').delete()
+        self.assertFalse(Tombstone.objects.exists())
+
+        pk = self.user.pk
+        self.user.delete()
+        tombstone = Tombstone.objects.get()
+        self.assertEqual(tombstone.object_id, str(pk))
+
+    def test_deleted_since_watermark(self):
+        watermark = self.changes().data['watermark']
+        pk = self.user.pk
+        self.user.delete()
+
+        response = self.changes(watermark)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['deleted'], [pk])
+
+    def test_expired_watermark(self):
+        synced = timezone.now() - timedelta(days=31)
+        watermark = encode_watermark({
+            'm': None, 'd': None, 's': synced.isoformat()
+        })
+        self.assertEqual(self.changes(watermark).status_code, 410)
+
+        watermark = self.changes().data['watermark']
+        self.assertEqual(self.changes(watermark).status_code, 200)
+
+    def test_watermark_of_partial_sync(self):
+        users = [
+            User.objects.create_user(
+                email='user{0}@example.com'.format(i),
+                password='secret',
+                name='User'
+            )
+            for i in range(3)
+        ]
+        for user in users:
+            user.delete()
+        old = timezone.now() - timedelta(days=40)
+        Tombstone.objects.update(deleted_date=old)
+
+        with mock.patch.object(ExportUserViewSet, 'changes_page_size', 2):
+            response = self.changes()
+        self.assertTrue(response.data['more'])
+        watermark = json.loads(b64decode(response.data['watermark']))
+        self.assertEqual(watermark['s'], old.isoformat())
+        self.assertEqual(
+            self.changes(response.data['watermark']).status_code, 410
+        )
+
+    def test_prune(self):
+        self.user.delete()
+        kept = User.objects.create_user(
+            email='kept@example.com',
+            password='secret',
+            name='Kept'
+        )
+        Tombstone.objects.update(
+            deleted_date=timezone.now() - timedelta(days=31)
+        )
+        pk = kept.pk
+        kept.delete()
+
+        out = StringIO()
+        call_command('prune_tombstones', batch_size=1, stdout=out)
+        self.assertIn('1 tombstones deleted', out.getvalue())
+        self.assertEqual(
+            list(Tombstone.objects.values_list('object_id', flat=True)),
+            [str(pk)]
+        )
+
+
+class UserNameSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = User
+        fields = ['id', 'name']
+
+
+class UserNameViewSet(mixins.ListModelMixin,
+                      mixins.RetrieveModelMixin,
+                      viewsets.GenericViewSet,
+                      BaseGenericViewSet):
+    queryset = User.objects.order_by('pk')
+    serializer_class = UserNameSerializer
+
+
+class ConditionalGetTestCase(TestCase):
+    """Retrieve answers 304 when the row did not change."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@example.com',
+            password='secret',
+            name='User'
+        )
+
+    def get(self, action, viewset=UserNameViewSet, **headers):
+        kwargs = {'pk': self.user.pk} if action == 'retrieve' else {}
+        request = APIRequestFactory().get('/users', **headers)
+        force_authenticate(request, user=self.user)
+        return viewset.as_view({'get': action})(request, **kwargs)
+
+    def test_retrieve(self):
+        response = self.get('retrieve')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+
+        response = self.get('retrieve', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        self.user.name = 'Renamed'
+        self.user.save()
+        response = self.get('retrieve', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_not_conditional(self):
+        with self.assertNumQueries(1):
+            response = self.get('list')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+    def test_list_opt_in(self):
+        class ConditionalListViewSet(UserNameViewSet):
+            conditional_actions = ('list', 'retrieve')
+
+        etag = self.get('list', ConditionalListViewSet)['ETag']
+        response = self.get(
+            'list', ConditionalListViewSet, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
+
+
+@override_settings(JWT_EMBED_CLAIMS=True)
+class EmbeddedClaimsTestCase(TestCase):
+    """Tokens with a current permission version skip the database."""
+
+    def setUp(self):
+        for cache in (user_cache, permission_cache, version_cache):
+            cache.clear()
+        content_type = ContentType.objects.get_for_model(User)
+        self.permissions = [
+            Permission.objects.create(
+                name='Claims {0}'.format(i),
+                codename='claims_{0}'.format(i),
+                content_type=content_type
+            )
+            for i in range(4)
+        ]
+        self.group = Group.objects.create(name='group')
+        self.group.permissions.add(self.permissions[1])
+        self.user = User.objects.create_user(
+            email='user@example.com',
+            password='secret',
+            name='User'
+        )
+        self.user.groups.add(self.group)
+        self.user.user_permissions.add(self.permissions[0])
+
+    def authenticate(self, token):
+        return JSONWebTokenAuthentication().authenticate_credentials(token)
+
+    def test_current_version(self):
+        token = create_token(self.user)
+        with self.assertNumQueries(0):
+            user = self.authenticate(token)
+        self.assertIsInstance(user, TokenUser)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertFalse(user.is_staff)
+
+    def test_changes_fall_back(self):
+        def set_password():
+            self.user.set_password('other')
+            self.user.save()
+
+        def set_staff():
+            self.user.is_staff = True
+            self.user.save()
+
+        changes = {
+            'password': set_password,
+            'is_staff': set_staff,
+            'user permissions': lambda: self.user.user_permissions.add(
+                self.permissions[2]
+            ),
+            'group permissions': lambda: self.group.permissions.add(
+                self.permissions[3]
+            ),
+            'groups': lambda: self.user.groups.remove(self.group),
+        }
+        for name, change in changes.items():
+            with self.subTest(change=name):
+                token = create_token(self.user)
+                self.assertIsInstance(self.authenticate(token), TokenUser)
+
+                change()
+                for _ in range(2):
+                    self.assertIsInstance(self.authenticate(token), User)
+                self.assertIsInstance(
+                    self.authenticate(create_token(self.user)), TokenUser
+                )
+
+    def test_token_without_version(self):
+        with override_settings(JWT_EMBED_CLAIMS=False):
+            token = create_token(self.user)
+        self.assertNotIn('pv', jwt.decode(token, verify=False))
+
+        with self.assertNumQueries(1):
+            user = self.authenticate(token)
+        self.assertIsInstance(user, User)
+
+    def test_permissions(self):
+        user = self.authenticate(create_token(self.user))
+        self.assertIsInstance(user, TokenUser)
+
+        self.assertTrue(user.has_perm('users.claims_0'))
+        self.assertTrue(user.has_perm('users.claims_1'))
+        self.assertFalse(user.has_perm('users.add_user'))
+        self.assertTrue(user.has_perms(['users.claims_0', 'users.claims_1']))
+        self.assertTrue(user.has_module_perms('users'))
+        self.assertFalse(user.has_module_perms('auth'))
+
+
+class Thing(JsonMixin):
+    """Model with JSON data, its table is created by `--nomigrations`."""
+
+    name = models.CharField(max_length=32)
+
+    class Meta:
+        app_label = 'utils'
+        indexes = [json_key_index('size__width', name='utils_thing_width')]
+
+
+class ThingSerializer(serializers.ModelSerializer):
+    color = JsonKeyField('color')
+    width = JsonKeyField('size__width')
+
+    class Meta:
+        model = Thing
+        fields = ['name', 'color', 'width']
+
+
+class JsonTestCase(TestCase):
+    """Projections read the keys of the JSON data, not the whole field."""
+
+    def setUp(self):
+        self.thing = Thing.objects.create(
+            name='box',
+            data={'color': 'red', 'size': {'width': 3, 'height': 4}}
+        )
+
+    def test_project(self):
+        with CaptureQueriesContext(connection) as queries:
+            thing = Thing.objects.project('color', 'size__width').get()
+        self.assertEqual(thing.get_deferred_fields(), {'data'})
+        self.assertEqual(thing.data_color, 'red')
+        self.assertEqual(thing.data_size_width, 3)
+        # Only read by the two key extractions, not selected whole.
+        self.assertEqual(queries[0]['sql'].count('"utils_thing"."data"'), 2)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(thing.data['size']['height'], 4)
+
+    def test_projection_name(self):
+        self.assertEqual(projection_name('size__width'), 'data_size_width')
+        self.assertEqual(projection_name('a', 'extra'), 'extra_a')
+
+    def test_key_field_reads_projection(self):
+        self.assertEqual(
+            projected_keys(ThingSerializer), ['color', 'size__width']
+        )
+        thing = Thing.objects.project(*projected_keys(ThingSerializer)).get()
+        thing.data_color = 'blue'
+        with self.assertNumQueries(0):
+            data = ThingSerializer(thing).data
+        self.assertEqual(data, {'name': 'box', 'color': 'blue', 'width': 3})
+
+    def test_key_field_walks_data(self):
+        self.assertEqual(
+            ThingSerializer(self.thing).data,
+            {'name': 'box', 'color': 'red', 'width': 3}
+        )
+        for data in [{'size': 3}, {}, None]:
+            with self.subTest(data=data):
+                self.thing.data = data
+                self.assertEqual(
+                    ThingSerializer(self.thing).data,
+                    {'name': 'box', 'color': None, 'width': None}
+                )
+
+    def test_key_index(self):
+        editor = connection.schema_editor()
+        sql = str(Thing._meta.indexes[0].create_sql(Thing, editor))
+        self.assertIn('"utils_thing_width"', sql)
+        self.assertIn('JSON_EXTRACT("data", \'$."size"."width"\')', sql)
+
+        constraints = connection.introspection.get_constraints(
+            connection.cursor(), Thing._meta.db_table
+        )
+        self.assertTrue(constraints['utils_thing_width']['index'])
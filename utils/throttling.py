@@ -0,0 +1,310 @@
+"""Token bucket throttles shared by the worker processes.
+
+Buckets live in a fixed table of (key hash, tokens, last update) slots.
+With `THROTTLE_STORE` set, the table is a file mapped in memory by every
+worker process and locked with `flock`, so the limits hold for the whole
+server. Without it, every process has its own table.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from collections.abc import Mapping
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth.base_user import BaseUserManager
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from utils.metrics import register_collector
+
+# A stat slot is the scope name and its allowed and throttled counts.
+STAT_NAME_SIZE = 48
+STAT = struct.Struct('<{0}sdd'.format(STAT_NAME_SIZE))
+STAT_SLOTS = 32
+STATS_SIZE = STAT.size * STAT_SLOTS
+
+# A bucket slot is the key hash (0 when free), its tokens and update time.
+BUCKET = struct.Struct('<Qdd')
+
+# Slots looked at from the hash of a key before evicting the stalest.
+PROBES = 8
+
+
+@lru_cache(maxsize=1)
+def hash_key(secret):
+    """Return the blake2b key derived from `secret` (at most 64 bytes)."""
+    return hashlib.sha256(secret.encode('utf-8')).digest()
+
+
+def key_hash(key):
+    """
+    Hash of `key` keyed by `SECRET_KEY`, so that clients can't compute keys
+    landing in the slots of someone else's bucket to evict it.
+    """
+    value = int.from_bytes(
+        hashlib.blake2b(
+            key.encode('utf-8'),
+            digest_size=8,
+            key=hash_key(settings.SECRET_KEY)
+        ).digest(),
+        'little'
+    )
+    return value or 1
+
+
+class BucketStore(object):
+    """Token buckets of up to `size` keys, and the counts of each scope."""
+
+    def __init__(self, size=65536, path=None):
+        self.size = size
+        self.path = path
+        length = STATS_SIZE + size * BUCKET.size
+        self._fd = None
+        if path is None:
+            self._buffer = bytearray(length)
+        else:
+            self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(self._fd).st_size < length:
+                    os.ftruncate(self._fd, length)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            self._buffer = mmap.mmap(self._fd, length)
+        self._lock = threading.Lock()
+        self._stat_slots = {}
+
+    def _acquire(self):
+        self._lock.acquire()
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+    def _release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._lock.release()
+
+    def _find_bucket(self, key):
+        """Return the offset of the slot of `key`, and whether it is new."""
+        start = key % self.size
+        free = stalest = None
+        stalest_time = None
+        for probe in range(PROBES):
+            offset = STATS_SIZE + ((start + probe) % self.size) * BUCKET.size
+            slot_key, _, updated = BUCKET.unpack_from(self._buffer, offset)
+            if slot_key == key:
+                return offset, False
+            if slot_key == 0:
+                if free is None:
+                    free = offset
+            elif stalest_time is None or updated < stalest_time:
+                stalest, stalest_time = offset, updated
+        return (free if free is not None else stalest), True
+
+    def _find_stat(self, scope):
+        offset = self._stat_slots.get(scope)
+        if offset is not None:
+            return offset
+
+        name = scope.encode('utf-8')[:STAT_NAME_SIZE]
+        for index in range(STAT_SLOTS):
+            offset = index * STAT.size
+            slot_name = STAT.unpack_from(self._buffer, offset)[0]
+            slot_name = slot_name.rstrip(b'\0')
+            if not slot_name:
+                STAT.pack_into(self._buffer, offset, name, 0.0, 0.0)
+            elif slot_name != name:
+                continue
+            self._stat_slots[scope] = offset
+            return offset
+        return None
+
+    def take(self, scope, key, rate, capacity, now=None):
+        """
+        Take a token from the bucket of `key`, which holds up to `capacity`
+        tokens refilled at `rate` per second. Return 0 when taken, else the
+        seconds until the next token.
+        """
+        if now is None:
+            now = time.time()
+        key = key_hash('{0}:{1}'.format(scope, key))
+
+        self._acquire()
+        try:
+            offset, new = self._find_bucket(key)
+            if new:
+                tokens = float(capacity)
+            else:
+                _, tokens, updated = BUCKET.unpack_from(self._buffer, offset)
+                tokens = min(
+                    float(capacity), tokens + max(0.0, now - updated) * rate
+                )
+
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+            BUCKET.pack_into(self._buffer, offset, key, tokens, now)
+
+            stat = self._find_stat(scope)
+            if stat is not None:
+                name, allowed, throttled = STAT.unpack_from(
+                    self._buffer, stat
+                )
+                if wait:
+                    throttled += 1
+                else:
+                    allowed += 1
+                STAT.pack_into(self._buffer, stat, name, allowed, throttled)
+        finally:
+            self._release()
+        return wait
+
+    def stats(self):
+        """Return scope -> (allowed, throttled) counts."""
+        counts = {}
+        self._acquire()
+        try:
+            for index in range(STAT_SLOTS):
+                name, allowed, throttled = STAT.unpack_from(
+                    self._buffer, index * STAT.size
+                )
+                name = name.rstrip(b'\0')
+                if name:
+                    counts[name.decode('utf-8', 'replace')] = (
+                        allowed, throttled
+                    )
+        finally:
+            self._release()
+        return counts
+
+
+_store = None
+_store_pid = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the bucket store, opened again after forking."""
+    global _store, _store_pid
+    pid = os.getpid()
+    if _store_pid != pid:
+        with _store_lock:
+            if _store_pid != pid:
+                _store = BucketStore(
+                    settings.THROTTLE_BUCKETS, settings.THROTTLE_STORE
+                )
+                _store_pid = pid
+    return _store
+
+
+@register_collector
+def throttle_metrics():
+    """Requests allowed and throttled by scope."""
+    samples = []
+    for scope, (allowed, throttled) in sorted(get_store().stats().items()):
+        samples.append(({'scope': scope, 'result': 'allowed'}, allowed))
+        samples.append(({'scope': scope, 'result': 'throttled'}, throttled))
+    return [(
+        'throttle_requests_total',
+        'Requests checked by the throttles.',
+        'counter',
+        samples,
+    )]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttle by token bucket: a client may send a burst of N requests, then
+    one every period / N, for a rate of 'N/period' in
+    `DEFAULT_THROTTLE_RATES`, under the key '<throttle_scope of the
+    view>_<scope_suffix>'. An empty or missing rate turns it off. It never
+    touches the database.
+    """
+
+    scope_suffix = None
+    durations = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+    def get_ident_key(self, request, data):
+        """
+        Return what the requests are counted by, `None` to skip. `data` is
+        the parsed body of the request.
+        """
+        raise NotImplementedError('`get_ident_key()` must be implemented.')
+
+    def get_rate(self, scope):
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if not rate:
+            return None
+        num, period = rate.split('/')
+        return int(num), self.durations[period[0]]
+
+    def take(self, view_scope, request, data):
+        """
+        Take a token for the request under `view_scope`. Return 0 when
+        taken or throttled off, else the seconds until the next token.
+        """
+        self.wait_time = None
+        scope = '{0}_{1}'.format(view_scope, self.scope_suffix)
+        rate = self.get_rate(scope)
+        if rate is None:
+            return 0
+        key = self.get_ident_key(request, data)
+        if key is None:
+            return 0
+
+        num, duration = rate
+        self.wait_time = get_store().take(scope, key, num / duration, num)
+        return self.wait_time
+
+    def allow_request(self, request, view):
+        self.wait_time = None
+        view_scope = getattr(view, 'throttle_scope', None)
+        if view_scope is None:
+            return True
+        return not self.take(view_scope, request, request.data)
+
+    def wait(self):
+        return self.wait_time
+
+
+class IPThrottle(TokenBucketThrottle):
+    """Throttle by client address."""
+
+    scope_suffix = 'ip'
+
+    def get_ident_key(self, request, data):
+        return self.get_ident(request)
+
+
+class EmailThrottle(TokenBucketThrottle):
+    """Throttle by the email of the request body, whatever its case."""
+
+    scope_suffix = 'email'
+
+    def get_ident_key(self, request, data):
+        email = data.get('email') if isinstance(data, Mapping) else None
+        if not isinstance(email, str) or not email:
+            return None
+        return BaseUserManager.normalize_email(email).lower()
+
+
+def throttle_wait(view, request, data):
+    """
+    Return the seconds until a request to `view` is allowed by its
+    `throttle_classes` under its `throttle_scope`, 0 when it is now, the
+    way DRF checks them. For the views serving it outside of DRF, which
+    parse the `data` of the body themselves.
+    """
+    return max(
+        [throttle_class().take(view.throttle_scope, request, data)
+         for throttle_class in view.throttle_classes],
+        default=0
+    )
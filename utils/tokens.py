@@ -2,10 +2,14 @@
 from calendar import timegm
 from datetime import datetime
 
+from django.conf import settings
+
 from jwt import decode
 
 from rest_framework_jwt.settings import api_settings
 
+from users.backends import permission_version
+
 
 def jwt_decode_handler(token):
     """Decode token for user"""
@@ -26,10 +30,21 @@ def jwt_decode_handler(token):
 
 
 def create_token(user):
-    """Create token"""
+    """Create token
+
+    With `JWT_EMBED_CLAIMS` the flags of the user and its permission version
+    are signed into the token too.
+    """
     jwt_payload_handler = api_settings.JWT_PAYLOAD_HANDLER
     jwt_encode_handler = api_settings.JWT_ENCODE_HANDLER
     payload = jwt_payload_handler(user)
+    if settings.JWT_EMBED_CLAIMS:
+        payload.update({
+            'is_staff': user.is_staff,
+            'is_active': user.is_active,
+            'is_superuser': user.is_superuser,
+            'pv': permission_version(user),
+        })
     if api_settings.JWT_ALLOW_REFRESH:
         payload['orig_iat'] = timegm(
             datetime.utcnow().utctimetuple()